@@ -0,0 +1,113 @@
+import os
+import json
+import hashlib
+import numpy as np
+
+# the monomial coefficients of an entry are in the variables normalized
+# on its box, entries of other layouts have other keys
+FORMAT = 'normalized'
+
+
+class ApproximationCache(object):
+    """
+    content-addressed disk cache of bernstein approximations
+    an entry is keyed by the network hash, degree bound, output index,
+    error bound, the settings of the error analysis and the box
+    quantized outward to a tolerance,
+    least recently used entries are evicted beyond max_size bytes
+    """
+    def __init__(self, cache_dir, tolerance=0.0, max_size=2**28):
+        self.cache_dir = cache_dir
+        self.tolerance = tolerance
+        self.max_size = max_size
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+
+    def quantize(self, box):
+        """
+        smallest box on the tolerance grid that contains the box,
+        an approximation computed on it is sound for the original box
+        """
+        box = np.asarray(box, dtype=np.float64)
+        if self.tolerance <= 0:
+            return box
+        lower = np.floor(box[:, 0] / self.tolerance) * self.tolerance
+        upper = np.ceil(box[:, 1] / self.tolerance) * self.tolerance
+        # rounding of the division may leave the grid point inside
+        lower[lower > box[:, 0]] -= self.tolerance
+        upper[upper < box[:, 1]] += self.tolerance
+        return np.stack([lower, upper], axis=1)
+
+    def key(self, network_hash, d, box, output_index, error_bound,
+            settings=()):
+        content = json.dumps([
+            FORMAT,
+            network_hash,
+            [int(d_j) for d_j in d],
+            [[repr(float(v)) for v in interval] for interval in box],
+            int(output_index),
+            repr(float(error_bound)),
+            list(settings)
+        ])
+        return hashlib.sha256(content.encode()).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.cache_dir, key + '.json')
+
+    def get(self, key):
+        """
+        return the dense monomial coefficients and the error bound
+        string or None
+        """
+        path = self.path(key)
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+            # the modification time orders the entries for eviction
+            os.utime(path, None)
+            monomials = np.array(entry['monomials'], dtype=np.float64)
+            error = entry['error']
+        except (OSError, ValueError, KeyError):
+            return None
+        return monomials, error
+
+    def put(self, key, monomials, error):
+        path = self.path(key)
+        tmp_path = '{}.{}.tmp'.format(path, os.getpid())
+        with open(tmp_path, 'w') as f:
+            # the float repr of json round-trips exactly
+            json.dump({'monomials': monomials.tolist(), 'error': error}, f)
+        os.replace(tmp_path, path)
+        self.evict()
+
+    def evict(self):
+        entries = []
+        total_size = 0
+        for entry in os.scandir(self.cache_dir):
+            if not entry.name.endswith('.json'):
+                continue
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total_size += stat.st_size
+        entries.sort()
+        for _, size, path in entries:
+            if total_size <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total_size -= size
+
+
+def network_hash(nn):
+    """
+    hash of all parameters and the activation of a network
+    """
+    content = hashlib.sha256()
+    content.update(np.ascontiguousarray(nn.param, dtype=np.float64).tobytes())
+    content.update('_'.join(nn.activations).encode())
+    return content.hexdigest()
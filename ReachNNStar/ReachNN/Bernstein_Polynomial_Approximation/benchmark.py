@@ -0,0 +1,221 @@
+import io
+import os
+import re
+import ast
+import csv
+import glob
+import time
+import argparse
+import contextlib
+import numpy as np
+import sympy as sp
+
+import error_bound
+import error_analysis as ea
+from profiler import profiler
+from split_verification import driver_initial_box
+from network_parser import nn_controller_details
+
+
+def driver_benchmarks(systems_dir='systems'):
+    """
+    network, activation, degree bound and initial box of every flow*
+    driver in systems_dir
+    """
+    benchmarks = []
+    for path in sorted(glob.glob(os.path.join(systems_dir, '*.cpp'))):
+        with open(path) as f:
+            source = f.read()
+        settings = {}
+        # the last assignment of a setting is the one in effect
+        for name in ['activation', 'degree_bound', 'neural_network']:
+            values = re.findall(
+                r'char const \*' + name + r' = "([^"]*)"', source
+            )
+            if values:
+                settings[name] = values[-1]
+        box = driver_initial_box(source)
+        if len(settings) < 3 or not box:
+            continue
+        benchmarks.append((
+            settings['neural_network'],
+            settings['activation'],
+            ast.literal_eval(settings['degree_bound']),
+            box
+        ))
+    return benchmarks
+
+
+def scale_box(box, scale):
+    """
+    box with the same center and the widths multiplied by scale
+    """
+    box = np.asarray(box, dtype=np.float64)
+    center = box.mean(axis=1)
+    radius = (box[:, 1] - box[:, 0]) / 2 * scale
+    return np.stack([center - radius, center + radius], axis=1).tolist()
+
+
+def best_time(function, repeat):
+    """
+    shortest wall time of repeat calls and the result of the last one
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def run_benchmark(
+    nn, network, activation, d, box, output_index, repeat, sympy
+):
+    """
+    time the stages of the approximation of one output on one box
+    """
+    row = {}
+    if sympy:
+        state_vars = sp.symbols('x:' + str(len(d)))
+        row['bernstein_s'], _ = best_time(
+            lambda: ea.nn_poly_approx_bernstein(
+                nn.controller, state_vars, d, box, output_index
+            ),
+            repeat
+        )
+    row['coefficients_s'], (_, coeffs) = best_time(
+        lambda: ea.nn_poly_approx_bernstein_cuda(
+            nn.controller, d, box, output_index
+        ),
+        repeat
+    )
+    # a fresh cache so that the layer bounds are not reused
+    row['lipschitz_s'], _ = best_time(
+        lambda: ea.lipschitz(
+            nn, box, output_index, activation, cache={},
+            method=error_bound.lipschitz_method
+        ),
+        repeat
+    )
+    profiler.record = {}
+    with contextlib.redirect_stdout(io.StringIO()):
+        row['error_s'], error = best_time(
+            lambda: ea.bernstein_error_partition_cuda(
+                nn, nn.controller, d, box, output_index, activation,
+                network, layer_cache={}, coeffs=coeffs
+            ),
+            repeat
+        )
+    row['partition'] = profiler.record.get('partition')
+    row['samples'] = profiler.record.get('samples', 0) // repeat
+    row['error_bound'] = float(error)
+    profiler.record = {}
+    return row
+
+
+def format_table(rows, columns):
+    """
+    rows aligned in columns as plain text
+    """
+    cells = [columns] + [
+        [
+            '{:.4g}'.format(row[c]) if isinstance(row[c], float)
+            else str(row[c])
+            for c in columns
+        ]
+        for row in rows
+    ]
+    widths = [
+        max(len(line[j]) for line in cells) for j in range(len(columns))
+    ]
+    return '\n'.join(
+        '  '.join(
+            cell.ljust(width) for cell, width in zip(line, widths)
+        ).rstrip()
+        for line in cells
+    )
+
+
+def run(args):
+    error_bound.error_bound = args.error_bound
+    error_bound.adaptive_partition = False
+    # the repeats would reuse the envelope of the first one
+    error_bound.incremental = False
+    error_bound.workers = args.workers
+    error_bound.profile_trace = None
+    error_bound.lipschitz_method = args.lipschitz
+
+    degrees = [int(d) for d in args.degrees.split(',')] if args.degrees \
+        else [None]
+    scales = [float(s) for s in args.box_scales.split(',')]
+    rows = []
+    for network, activation, d_driver, box_driver in driver_benchmarks():
+        if args.networks and not any(
+            network.startswith(prefix) for prefix in args.networks.split(',')
+        ):
+            continue
+        if not os.path.exists(os.path.join('nn', network)):
+            print('skip {}: network file not found'.format(network))
+            continue
+        nn = nn_controller_details(network, activation)
+        for degree in degrees:
+            d = d_driver if degree is None else [degree] * len(d_driver)
+            for scale in scales:
+                box = scale_box(box_driver, scale)
+                row = {
+                    'network': network,
+                    'activation': activation,
+                    'degree': 'x'.join(str(d_j) for d_j in d),
+                    'box_scale': scale,
+                }
+                row.update(run_benchmark(
+                    nn, network, activation, d, box, 0, args.repeat,
+                    not args.skip_sympy
+                ))
+                rows.append(row)
+                print('{network} {degree} {box_scale}: {error_s:.4g} s'.format(
+                    **row
+                ))
+
+    columns = ['network', 'activation', 'degree', 'box_scale']
+    if not args.skip_sympy:
+        columns.append('bernstein_s')
+    columns += [
+        'coefficients_s', 'lipschitz_s', 'error_s', 'partition', 'samples',
+        'error_bound'
+    ]
+    print(format_table(rows, columns))
+    with open(args.output, 'w') as f:
+        writer = csv.DictWriter(f, columns, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Time the stages of the bernstein approximation on '
+                    'the networks of the flow* drivers, run from this '
+                    'directory'
+    )
+    parser.add_argument('--networks', default='', type=str,
+                        help='Comma separated prefixes of the networks')
+    parser.add_argument('--degrees', default='', type=str,
+                        help='Comma separated degrees, the driver degree '
+                             'bound by default')
+    parser.add_argument('--box_scales', default='1', type=str,
+                        help='Comma separated scales of the initial box')
+    parser.add_argument('--error_bound', default=1e-3, type=float,
+                        help='Required senstivity of the NNCS')
+    parser.add_argument('--workers', default=1, type=int,
+                        help='Processes sampling the error, 0 for all cores')
+    parser.add_argument('--lipschitz', default='layer', type=str,
+                        choices=['layer', 'jacobian', 'min'],
+                        help='Bound of the Lipschitz constant')
+    parser.add_argument('--repeat', default=3, type=int,
+                        help='Runs of each stage, the shortest is reported')
+    parser.add_argument('--skip_sympy', action='store_true',
+                        help='Skip the symbolic nn_poly_approx_bernstein')
+    parser.add_argument('--output', default='benchmark.csv', type=str,
+                        help='CSV file of the results table')
+    args = parser.parse_args()
+    run(args)
@@ -22,7 +22,7 @@ string bernsteinPolyApproximation(char const *module_name, char const *function_
 		/* pFunc is a new reference */
 
 		if (pFunc && PyCallable_Check(pFunc)) {
-			if (strcmp("poly_approx_controller", function_name) == 0) {
+			if (strcmp("poly_approx_controller", function_name) == 0 || strcmp("poly_approx_controllers", function_name) == 0) {
 				//cout << "try: dubins_poly_controller, but invoke: " << function_name << "  " << strcmp("dubins_poly_controller", function_name) << endl;
 				
 				pArgs = PyTuple_New(5);
@@ -48,7 +48,7 @@ string bernsteinPolyApproximation(char const *module_name, char const *function_
 					return "11";
 				}
 			}
-			else if (strcmp("poly_approx_error", function_name) == 0) {
+			else if (strcmp("poly_approx_error", function_name) == 0 || strcmp("poly_approx_errors", function_name) == 0) {
 				//cout << "try: poly_approx_error, but invoke: " << function_name << "  " << strcmp("dubins_poly_controller", function_name) << endl;
 
 				pArgs = PyTuple_New(5);
@@ -176,4 +176,182 @@ string bernsteinPolyApproximation(char const *module_name, char const *function_
 	return "0";
 }
 
+bool bernsteinPolyApproximationArrays(char const *module_name, char const *function_name, char const *degree_bound, char const *box, char const *activation, char const *output_index, char const *neural_network, vector<vector<unsigned int> > & exponents, vector<double> & coefficients, vector<double> & normalization)
+{
+	// the function returns a tuple of a 2-d int32 array of exponents, a 1-d float64 array of coefficients
+	// and a 2-d float64 array of the box [alpha_j, beta_j] normalizing the variables, which is flattened into normalization
+	PyObject *pName, *pModule, *pFunc, *pValue;
+	bool success = false;
+
+	Py_Initialize();
+	PyRun_SimpleString("import sys, os");
+	PyRun_SimpleString("sys.path.append(\".\")");
+
+	pName = PyUnicode_DecodeFSDefault(module_name);
+	pModule = PyImport_Import(pName);
+	Py_DECREF(pName);
+
+	if (pModule == NULL) {
+		PyErr_Print();
+		fprintf(stderr, "Failed to load \"%s\"\n", module_name);
+		return false;
+	}
+
+	pFunc = PyObject_GetAttrString(pModule, function_name);
+	if (pFunc == NULL || !PyCallable_Check(pFunc)) {
+		if (PyErr_Occurred())
+			PyErr_Print();
+		cout << "Cannot find function: " << function_name << endl;
+		Py_XDECREF(pFunc);
+		Py_DECREF(pModule);
+		return false;
+	}
+
+	pValue = PyObject_CallFunction(pFunc, "sssss", degree_bound, box, output_index, activation, neural_network);
+
+	if (pValue != NULL && PyTuple_Check(pValue) && PyTuple_Size(pValue) == 3) {
+		Py_buffer exponents_view, coefficients_view, normalization_view;
+
+		if (PyObject_GetBuffer(PyTuple_GetItem(pValue, 0), &exponents_view, PyBUF_C_CONTIGUOUS | PyBUF_FORMAT) == 0) {
+			if (PyObject_GetBuffer(PyTuple_GetItem(pValue, 1), &coefficients_view, PyBUF_C_CONTIGUOUS | PyBUF_FORMAT) == 0) {
+				if (PyObject_GetBuffer(PyTuple_GetItem(pValue, 2), &normalization_view, PyBUF_C_CONTIGUOUS | PyBUF_FORMAT) == 0) {
+					if (exponents_view.ndim == 2 && exponents_view.itemsize == sizeof(int) && strcmp(exponents_view.format, "i") == 0
+						&& coefficients_view.ndim == 1 && coefficients_view.itemsize == sizeof(double) && strcmp(coefficients_view.format, "d") == 0
+						&& coefficients_view.shape[0] == exponents_view.shape[0]
+						&& normalization_view.ndim == 2 && normalization_view.itemsize == sizeof(double) && strcmp(normalization_view.format, "d") == 0
+						&& normalization_view.shape[0] == exponents_view.shape[1] && normalization_view.shape[1] == 2) {
+						Py_ssize_t num_terms = exponents_view.shape[0];
+						Py_ssize_t num_vars = exponents_view.shape[1];
+						const int *exponents_data = (const int *)exponents_view.buf;
+						const double *coefficients_data = (const double *)coefficients_view.buf;
+						const double *normalization_data = (const double *)normalization_view.buf;
+
+						exponents.assign(num_terms, vector<unsigned int>(num_vars, 0));
+						coefficients.assign(coefficients_data, coefficients_data + num_terms);
+						normalization.assign(normalization_data, normalization_data + 2 * num_vars);
+
+						for (Py_ssize_t i = 0; i < num_terms; ++i) {
+							for (Py_ssize_t j = 0; j < num_vars; ++j) {
+								exponents[i][j] = exponents_data[i * num_vars + j];
+							}
+						}
+						success = true;
+					}
+					else {
+						fprintf(stderr, "Unexpected array layout returned by %s\n", function_name);
+					}
+					PyBuffer_Release(&normalization_view);
+				}
+				PyBuffer_Release(&coefficients_view);
+			}
+			PyBuffer_Release(&exponents_view);
+		}
+	}
+
+	if (!success) {
+		if (PyErr_Occurred())
+			PyErr_Print();
+		fprintf(stderr, "Call %s failed\n", function_name);
+	}
+
+	Py_XDECREF(pValue);
+	Py_DECREF(pFunc);
+	Py_DECREF(pModule);
+	return success;
+}
+
+vector<string> splitApproximations(const string & results)
+{
+	// results of poly_approx_controllers and poly_approx_errors are separated by ';'
+	vector<string> items;
+	size_t begin = 0;
+	size_t end = results.find(';');
+
+	while (end != string::npos) {
+		items.push_back(results.substr(begin, end - begin));
+		begin = end + 1;
+		end = results.find(';', begin);
+	}
+	items.push_back(results.substr(begin));
+
+	return items;
+}
+
+double wallClock()
+{
+	// seconds of a monotonic clock, differences are wall times
+	return chrono::duration<double>(chrono::steady_clock::now().time_since_epoch()).count();
+}
+
+void profileReach(double seconds)
+{
+	// close the profiling record of the control step in profiler.py
+	Py_Initialize();
+	PyObject *pName = PyUnicode_DecodeFSDefault("profiler");
+	PyObject *pModule = PyImport_Import(pName);
+	Py_DECREF(pName);
 
+	if (pModule == NULL) {
+		PyErr_Print();
+		fprintf(stderr, "Failed to load \"profiler\"\n");
+		return;
+	}
+
+	PyObject *pValue = PyObject_CallMethod(pModule, "record_reach", "d", seconds);
+	if (pValue == NULL) {
+		PyErr_Print();
+		fprintf(stderr, "Call record_reach failed\n");
+	}
+	else {
+		Py_DECREF(pValue);
+	}
+	Py_DECREF(pModule);
+}
+
+void profileRun(char const *driver, string const & tag)
+{
+	// label the profiling records in profiler.py with the driver and its output tag
+	Py_Initialize();
+	PyRun_SimpleString("import sys");
+	PyRun_SimpleString("sys.path.append(\".\")");
+	PyObject *pName = PyUnicode_DecodeFSDefault("profiler");
+	PyObject *pModule = PyImport_Import(pName);
+	Py_DECREF(pName);
+
+	if (pModule == NULL) {
+		PyErr_Print();
+		fprintf(stderr, "Failed to load \"profiler\"\n");
+		return;
+	}
+
+	PyObject *pValue = PyObject_CallMethod(pModule, "record_run", "ss", driver, tag.c_str());
+	if (pValue == NULL) {
+		PyErr_Print();
+		fprintf(stderr, "Call record_run failed\n");
+	}
+	else {
+		Py_DECREF(pValue);
+	}
+	Py_DECREF(pModule);
+}
+
+void readInitialSetArguments(int argc, char *argv[], vector<double> & bounds, string & tag)
+{
+	// argv[1] overrides the initial set as "l0,u0,l1,u1,...", argv[2] is appended to the output file names
+	bounds.clear();
+	tag = "";
+
+	if (argc > 1) {
+		stringstream ss(argv[1]);
+		string item;
+		while (getline(ss, item, ',')) {
+			bounds.push_back(stod(item));
+		}
+	}
+
+	if (argc > 2) {
+		tag = argv[2];
+	}
+
+	profileRun(argv[0], tag);
+}
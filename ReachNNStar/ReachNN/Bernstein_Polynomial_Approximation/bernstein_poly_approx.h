@@ -3,13 +3,29 @@
 
 #include <python3.6/Python.h>
 #include <algorithm>
+#include <chrono>
 #include <iostream>
 #include <list>
+#include <sstream>
+#include <string>
+#include <vector>
 
 using namespace std;
 
 string bernsteinPolyApproximation(char const *module_name, char const *function_name, char const *degree_bound, char const *box, char const *activation, char const *output_index, char const *neural_network);
 
+bool bernsteinPolyApproximationArrays(char const *module_name, char const *function_name, char const *degree_bound, char const *box, char const *activation, char const *output_index, char const *neural_network, vector<vector<unsigned int> > & exponents, vector<double> & coefficients, vector<double> & normalization);
+
+vector<string> splitApproximations(const string & results);
+
+double wallClock();
+
+void profileReach(double seconds);
+
+void profileRun(char const *driver, string const & tag);
+
+void readInitialSetArguments(int argc, char *argv[], vector<double> & bounds, string & tag);
+
 
 #endif
 
@@ -0,0 +1,66 @@
+#ifndef bernstein_taylor_model
+#define bernstein_taylor_model
+
+#include "../flowstar/Continuous.h"
+#include "bernstein_poly_approx.h"
+
+using namespace flowstar;
+
+/*
+ * Taylor model of the controller polynomial over the flowpipe, built from the
+ * exponents, coefficients and normalization of bernsteinPolyApproximationArrays.
+ * Term i is coefficients[i] * y0^exponents[i][0] * ... where
+ * yj = (xj - normalization[2j]) / (normalization[2j+1] - normalization[2j])
+ * is the j-th state variable normalized on the box of the approximation, as in
+ * the expression strings of poly_approx_controller. The normalized variables are
+ * evaluated with the interval arithmetic of Expression_AST on tms_of_vars, and
+ * the remainder of the result does not include the error bound.
+ */
+inline void polyApproximationTaylorModel(TaylorModel<Real> & result, const vector<vector<unsigned int> > & exponents, const vector<double> & coefficients,
+		const vector<double> & normalization, const vector<TaylorModel<Real> > & tms_of_vars, const vector<Interval> & domain, const unsigned int order,
+		const Interval & cutoff_threshold, const Global_Computation_Setting & g_setting)
+{
+	vector<TaylorModel<Real> > normalized(normalization.size() / 2);
+
+	for (unsigned int j = 0; j < normalized.size(); ++j)
+	{
+		ostringstream strNormalized;
+		strNormalized << setprecision(17) << "(x" << j << " - (" << normalization[2 * j] << ")) / ("
+			<< normalization[2 * j + 1] << " - (" << normalization[2 * j] << "))";
+
+		Expression_AST<Real> exp_normalized(strNormalized.str());
+		exp_normalized.evaluate(normalized[j], tms_of_vars, order, domain, cutoff_threshold, g_setting);
+	}
+
+	// the variables of the polynomial composed with the normalized variables are t, y0, y1, ...
+	unsigned int numVars = normalized.size() + 1;
+
+	Polynomial<Real> expansion;
+
+	for (unsigned int i = 0; i < coefficients.size(); ++i)
+	{
+		Polynomial<Real> monomial(Real(coefficients[i]), numVars);
+
+		for (unsigned int j = 0; j < exponents[i].size(); ++j)
+		{
+			if (exponents[i][j] > 0)
+			{
+				Polynomial<Real> power(j + 1, exponents[i][j], numVars);
+				monomial *= power;
+			}
+		}
+
+		expansion += monomial;
+	}
+
+	TaylorModel<Real> tm(expansion);
+
+	TaylorModelVec<Real> vars(normalized);
+	vector<Interval> varsPolyRange;
+	vars.polyRange(varsPolyRange, domain);
+
+	tm.insert_ctrunc(result, vars, varsPolyRange, domain, order, cutoff_threshold);
+}
+
+
+#endif
@@ -0,0 +1,40 @@
+import os
+import sys
+import numpy as np
+import pytest
+
+# the modules import each other by flat names, as the flow* drivers put
+# this directory on sys.path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import error_bound  # noqa: E402
+import error_analysis as ea  # noqa: E402
+from neuralnetwork import NN  # noqa: E402
+
+
+def random_network(input_dim, hidden, outputs, activation, seed=0):
+    """
+    network with the parameter layout of the files in nn/
+    """
+    rng = np.random.RandomState(seed)
+    res = [input_dim, outputs, len(hidden)] + list(hidden)
+    sizes = [input_dim] + list(hidden) + [outputs]
+    for fan_in, fan_out in zip(sizes[:-1], sizes[1:]):
+        res += list(rng.randn(fan_out * (fan_in + 1)))
+    res += [0.0, 1.0]
+    return NN(np.array(res, dtype=np.float64), activation)
+
+
+@pytest.fixture
+def settings(monkeypatch):
+    monkeypatch.setattr(error_bound, 'error_bound', 1e-2, raising=False)
+    for name, value in [
+        ('adaptive_partition', False),
+        ('incremental', False),
+        ('incremental_tolerance', 0.1),
+        ('lipschitz_method', 'layer'),
+        ('workers', 1),
+    ]:
+        monkeypatch.setattr(error_bound, name, value, raising=False)
+    monkeypatch.setattr(ea, 'incremental_states', {})
+    return error_bound
@@ -1,7 +1,263 @@
 import error_analysis as ea
-import sympy as sp
 import ast
+import itertools
+import numpy as np
 from network_parser import nn_controller_details
+from approximation_cache import ApproximationCache, network_hash
+from profiler import profiler
+
+
+class ControllerApproximator(object):
+    """
+    long-lived bernstein approximation service of a neural network
+    controller, the network is loaded once and its NumPy evaluator
+    is kept warm across the control steps
+    """
+    def __init__(self, neural_network, activation):
+        self.neural_network = neural_network
+        self.activation = activation
+        profiler.label('network', neural_network)
+        with profiler.phase('network_load'):
+            self.nn = nn_controller_details(neural_network, activation)
+
+        # result of the latest box
+        self.last_key = None
+        self.last_result = None
+
+        import error_bound
+        self.error_bound = error_bound.error_bound
+        adaptive = getattr(error_bound, 'adaptive_partition', False)
+        incremental = getattr(error_bound, 'incremental', False)
+        # settings of the error analysis that change the error bound
+        self.settings = [
+            'adaptive' if adaptive else 'uniform',
+            getattr(error_bound, 'lipschitz_method', 'layer'),
+        ]
+        if incremental and not adaptive:
+            self.settings += [
+                'incremental',
+                repr(float(getattr(error_bound, 'incremental_tolerance', 0.1)))
+            ]
+        cache_dir = getattr(error_bound, 'cache_dir', None)
+        if cache_dir:
+            self.cache = ApproximationCache(
+                cache_dir,
+                getattr(error_bound, 'cache_tolerance', 0.0),
+                getattr(error_bound, 'cache_size', 2**28)
+            )
+            self.network_hash = network_hash(self.nn)
+        else:
+            self.cache = None
+
+        self.auto_degree = getattr(error_bound, 'auto_degree', False)
+        self.degree_target = getattr(error_bound, 'degree_target', 0.01)
+        self.degree_max = getattr(error_bound, 'degree_max', 3)
+        # selected degree bounds per box size class and outputs
+        self.degrees = {}
+
+    def degree_bound(self, d_str, box, output_indices):
+        """
+        the degree bound given by the driver, or the one selected for
+        the box if it is "auto" or auto_degree is set in error_bound.py
+        """
+        if d_str.strip() != 'auto' and not self.auto_degree:
+            return ast.literal_eval(d_str)
+        key = (box_size_class(box), tuple(output_indices))
+        if key not in self.degrees:
+            self.degrees[key] = self.select_degree(box, output_indices)
+        return self.degrees[key]
+
+    def select_degree(self, box, output_indices):
+        """
+        cheapest degree bound, see degree_cost, whose error bounds on
+        the box meet the target, the candidates are tried by increasing
+        cost and the error sampling of a failing one stops at the target
+        if none meets it, the one of smallest full error bound is taken
+        """
+        # the Lipschitz term of the bound alone may reach error_bound
+        if self.degree_target <= self.error_bound:
+            raise ValueError(
+                'degree_target {} can not be met, it has to be larger '
+                'than error_bound {}'.format(
+                    self.degree_target, self.error_bound
+                )
+            )
+        candidates = sorted(
+            itertools.product(range(1, self.degree_max + 1), repeat=len(box)),
+            key=lambda d: (degree_cost(d), d)
+        )
+        # the Lipschitz constants do not depend on the degree
+        layer_cache = {}
+        # errors of a sampling stopped at the target are lower bounds
+        lower_bounds = []
+        for d in candidates:
+            d = list(d)
+            profiler.count('degree_candidates', 1)
+            polys, error_bounds = self.compute(
+                d, box, output_indices,
+                layer_cache=layer_cache, ceiling=self.degree_target
+            )
+            error = max(float(error_bound) for error_bound in error_bounds)
+            print('degree bound {}: error {}, cost {}'.format(
+                d, error, degree_cost(d)
+            ))
+            if error <= self.degree_target:
+                self.keep_result(d, box, output_indices, polys, error_bounds)
+                return d
+            lower_bounds.append((error, degree_cost(d), d))
+
+        # full bounds of the candidates whose lower bound may beat the best
+        best = None
+        for lower_bound, _, d in sorted(lower_bounds):
+            if best is not None and lower_bound >= best[0]:
+                break
+            polys, error_bounds = self.compute(
+                d, box, output_indices, layer_cache=layer_cache
+            )
+            error = max(float(error_bound) for error_bound in error_bounds)
+            if best is None or error < best[0]:
+                best = (error, d, polys, error_bounds)
+        error, d, polys, error_bounds = best
+        print('warning: no degree bound meets the target {}, {} with error '
+              '{} is used'.format(self.degree_target, d, error))
+        self.keep_result(d, box, output_indices, polys, error_bounds)
+        return d
+
+    def keep_result(self, d, box, output_indices, polys, error_bounds):
+        """
+        keep an approximation computed by select_degree for the step
+        """
+        # entries of the disk cache are computed on the quantized box
+        if self.cache is None:
+            self.last_key = (tuple(d), str(box), tuple(output_indices))
+            self.last_result = (polys, error_bounds)
+
+    def approximate(self, d, box, output_index):
+        """
+        return the polynomial as its dense monomial coefficients in the
+        normalized variables and the box that normalizes them, see
+        error_analysis.bernstein_to_monomial, and its error bound on
+        the box
+        """
+        polys, error_bounds = self.approximate_outputs(d, box, [output_index])
+        return polys[0], error_bounds[0]
+
+    def approximate_outputs(self, d, box, output_indices):
+        """
+        return the polynomials and error bounds of several
+        outputs, the network is evaluated once per grid for all of them
+        """
+        key = (tuple(d), str(box), tuple(output_indices))
+        if key != self.last_key:
+            if self.cache is not None:
+                self.last_result = self.approximate_cached(
+                    d, box, output_indices
+                )
+            else:
+                self.last_result = self.compute(d, box, output_indices)
+            self.last_key = key
+        return self.last_result
+
+    def approximate_cached(self, d, box, output_indices):
+        """
+        look the outputs up in the disk cache, the missing ones are
+        computed on the quantized box which contains the given box
+        """
+        box = self.cache.quantize(box)
+        cache_keys = [
+            self.cache.key(
+                self.network_hash, d, box, output_index,
+                self.error_bound, self.settings
+            )
+            for output_index in output_indices
+        ]
+        entries = [self.cache.get(cache_key) for cache_key in cache_keys]
+        missing = [i for i, entry in enumerate(entries) if entry is None]
+        profiler.count('cache_hits', len(entries) - len(missing))
+        if missing:
+            polys, error_bounds = self.compute(
+                d, box.tolist(), [output_indices[i] for i in missing]
+            )
+            for i, poly, error_bound in zip(missing, polys, error_bounds):
+                monomials, _ = poly
+                self.cache.put(cache_keys[i], monomials, error_bound)
+                entries[i] = (monomials, error_bound)
+        # the polynomials are normalized on the quantized box
+        return (
+            [(monomials, box.tolist()) for monomials, _ in entries],
+            [error_bound for _, error_bound in entries]
+        )
+
+    def compute(self, d, box, output_indices, layer_cache=None, ceiling=None):
+        """
+        evaluate the network on the grids of the box
+        """
+        with profiler.phase('coefficients'):
+            _, coeffs = ea.nn_poly_approx_bernstein_cuda(
+                self.nn.controller, d, box, list(output_indices)
+            )
+        with profiler.phase('polynomial'):
+            polys = [
+                (ea.bernstein_to_monomial(coeffs_i, d), box)
+                for coeffs_i in coeffs
+            ]
+            conversion_errors = [
+                ea.bernstein_conversion_error(coeffs_i, d)
+                for coeffs_i in coeffs
+            ]
+        error_bounds = ea.bernstein_error_partition_cuda(
+            self.nn,
+            self.nn.controller,
+            d,
+            box,
+            list(output_indices),
+            self.activation,
+            self.neural_network,
+            layer_cache={} if layer_cache is None else layer_cache,
+            coeffs=coeffs,
+            ceiling=ceiling
+        )
+        # the rounding of the monomial coefficients is part of the bound
+        return polys, [
+            ea.p2c(np.nextafter(error_bound + conversion_error, np.inf))
+            for error_bound, conversion_error in zip(
+                error_bounds, conversion_errors
+            )
+        ]
+
+
+def box_size_class(box):
+    """
+    octave of the width of each dimension of the box
+    """
+    widths = np.diff(np.asarray(box, dtype=np.float64), axis=1)[:, 0]
+    return tuple(
+        int(np.floor(np.log2(width))) if width > 0 else None
+        for width in widths
+    )
+
+
+def degree_cost(d):
+    """
+    cost model of a degree bound, the coefficient grid and the terms of
+    the polynomial grow with prod(d + 1), and the taylor model arithmetic
+    of the flow* reachability with the total degree
+    """
+    terms = 1
+    for d_j in d:
+        terms *= d_j + 1
+    return terms * sum(d)
+
+
+# approximators alive in this interpreter
+approximators = {}
+
+
+def get_approximator(neural_network, activation):
+    key = (neural_network, activation)
+    if key not in approximators:
+        approximators[key] = ControllerApproximator(neural_network, activation)
+    return approximators[key]
 
 
 def poly_approx_controller(
@@ -11,13 +267,34 @@ def poly_approx_controller(
     activation,
     nerual_network
 ):
-    d = ast.literal_eval(d_str)
     box = ast.literal_eval(box_str)
     output_i = ast.literal_eval(output_index)
-    nn = nn_controller_details(nerual_network, activation, reuse=True)
-    x = sp.symbols('x:' + str(nn.num_of_inputs))
-    b, _, _ = ea.nn_poly_approx_bernstein(nn.controller, x, d, box, output_i)
-    return ea.p2c(b)
+    approximator = get_approximator(nerual_network, activation)
+    d = approximator.degree_bound(d_str, box, [output_i])
+    poly, _ = approximator.approximate(d, box, output_i)
+    with profiler.phase('polynomial'):
+        return ea.monomial_to_flowstar(*poly)
+
+
+def poly_approx_controller_arrays(
+    d_str,
+    box_str,
+    output_index,
+    activation,
+    nerual_network
+):
+    """
+    polynomial as an int32 array of exponents, one row per term, a
+    float64 array of coefficients and the float64 box of the normalized
+    variables, read through the buffer protocol by
+    bernsteinPolyApproximationArrays
+    """
+    box = ast.literal_eval(box_str)
+    output_i = ast.literal_eval(output_index)
+    approximator = get_approximator(nerual_network, activation)
+    d = approximator.degree_bound(d_str, box, [output_i])
+    poly, _ = approximator.approximate(d, box, output_i)
+    return ea.monomial_to_arrays(*poly)
 
 
 def poly_approx_error(
@@ -27,17 +304,47 @@ def poly_approx_error(
     activation,
     nerual_network
 ):
-    d = ast.literal_eval(d_str)
     box = ast.literal_eval(box_str)
     output_i = ast.literal_eval(output_index)
-    nn = nn_controller_details(nerual_network, activation, reuse=True)
-    error_bound = ea.bernstein_error_partition_cuda(
-        nn,
-        nn.controller,
-        d,
-        box,
-        output_i,
-        activation,
-        nerual_network
-    )
-    return ea.p2c(error_bound)
+    approximator = get_approximator(nerual_network, activation)
+    d = approximator.degree_bound(d_str, box, [output_i])
+    _, error_bound = approximator.approximate(d, box, output_i)
+    return error_bound
+
+
+def poly_approx_controllers(
+    d_str,
+    box_str,
+    output_indices,
+    activation,
+    nerual_network
+):
+    """
+    polynomials of a list of outputs, e.g. output_indices = "[0, 1]",
+    separated by ';'
+    """
+    box = ast.literal_eval(box_str)
+    output_list = ast.literal_eval(output_indices)
+    approximator = get_approximator(nerual_network, activation)
+    d = approximator.degree_bound(d_str, box, output_list)
+    polys, _ = approximator.approximate_outputs(d, box, output_list)
+    with profiler.phase('polynomial'):
+        return ';'.join(ea.monomial_to_flowstar(*poly) for poly in polys)
+
+
+def poly_approx_errors(
+    d_str,
+    box_str,
+    output_indices,
+    activation,
+    nerual_network
+):
+    """
+    error bounds of a list of outputs separated by ';'
+    """
+    box = ast.literal_eval(box_str)
+    output_list = ast.literal_eval(output_indices)
+    approximator = get_approximator(nerual_network, activation)
+    d = approximator.degree_bound(d_str, box, output_list)
+    _, error_bounds = approximator.approximate_outputs(d, box, output_list)
+    return ';'.join(error_bounds)
@@ -1,16 +1,14 @@
 import os
 import argparse
-import math
-import h5py
-import tensorflow as tf
-import tf_util as U
+import multiprocessing
 import numpy as np
 import sympy as sp
 
 from scipy.special import comb
 from numpy import linalg as LA
-from scipy.optimize import linprog
 from polyval import polyval
+from profiler import profiler
+from neuralnetwork import activation_functions
 
 
 def nn_poly_approx_bernstein(
@@ -23,7 +21,7 @@ def nn_poly_approx_bernstein(
     """
     bernstein polynomial approximation of a given function f
     on a general box space
-    f: a function
+    f: a function evaluated on a batch of points, one point per row
     state_var: the input variable of f
     d: degree bound vector of bernstein polynomial
     box: box space of state variables [alpha_1, beta_1] times cdots
@@ -31,42 +29,24 @@ def nn_poly_approx_bernstein(
     """
     input_dim = len(state_vars)
     x = state_vars
-    all_comb_lists = degree_comb_lists(degree_bound, input_dim)
+    all_comb_lists, all_points = bernstein_grid(degree_bound, input_box)
+    # evaluate the network on all grid points at once
+    values = f(all_points)[output_index]
+    poly_min = np.min(values)
+    poly_max = np.max(values)
+    coeffs = values * bernstein_binomials(degree_bound)
     bernstein = 0
-    poly_min = np.inf
-    poly_max = -np.inf
     # construct bernstein polynomial for recover function + nerual network
     y = sp.symbols('y:'+str(input_dim))
-    for cb in all_comb_lists:
-        point = []
-        for j in range(input_dim):
-            k_j = cb[j]
-            d_j = degree_bound[j]
-            # linear transformation to normalize the box to I=[0,1]^m
-            # lower bound of the j-th component
-            alpha_j = np.float64(input_box[j][0])
-            # upper bound of the j-th component
-            beta_j = np.float64(input_box[j][1])
-            point.append(
-                (beta_j - alpha_j) *
-                (cb[j] / degree_bound[j])
-                + alpha_j
-            )
-        monomial = f(np.array(point, dtype=np.float64))[output_index]
-        if monomial < poly_min:
-            poly_min = monomial
-        if monomial > poly_max:
-            poly_max = monomial
+    for cb, coeff in zip(all_comb_lists, coeffs):
+        monomial = coeff
         for j in range(input_dim):
             y_j = y[j]
             k_j = cb[j]
             d_j = degree_bound[j]
-            monomial = (
-                monomial * comb(d_j, k_j) *
-                (y_j**k_j) * ((1 - y_j)**(d_j - k_j))
-            )
+            monomial = monomial * (y_j**k_j) * ((1 - y_j)**(d_j - k_j))
         bernstein = bernstein + monomial
-    poly_approx = bernstein[0]
+    poly_approx = bernstein
     for j in range(input_dim):
         y_j = y[j]
         x_j = x[j]
@@ -75,51 +55,156 @@ def nn_poly_approx_bernstein(
         poly_approx = poly_approx.subs(
             y_j, (x_j - alpha_j) / (beta_j - alpha_j)
         )
-    return poly_approx, poly_min[0], poly_max[0]
+    return poly_approx, poly_min, poly_max
 
 
 def nn_poly_approx_bernstein_cuda(f, d, box, output_index):
-    m = len(d)
-    all_comb_lists = degree_comb_lists(d, m)
-    coef_list = []
-    for cb in all_comb_lists:
-        point = []
-        for j in range(m):
-            # linear transformation to normalize the box to I=[0,1]^m
-            # lower bound of the j-th component
-            alpha_j = np.float64(box[j][0])
-            # upper bound of the j-th component
-            beta_j = np.float64(box[j][1])
-            point.append((beta_j-alpha_j)*(cb[j]/d[j])+alpha_j)
-        coef = f(np.array(point, dtype=np.float64))[output_index]
-        for j in range(m):
-            k_j = cb[j]
-            d_j = d[j]
-            coef = coef*comb(d_j, k_j)
-        coef_list.append(coef)
-    return np.array(all_comb_lists), np.array(coef_list)
-
-
-def point_shift_all(points, box, large_sample_times=False, shift_points=None):
-    if not large_sample_times:
-        new_points = np.ones_like(points)
-        for idxState in range(points.shape[1]):
-            alpha_j = np.float64(box[idxState][0])
-            beta_j = np.float64(box[idxState][1])
-            new_points[:, idxState] = (
-                (points[:, idxState] - alpha_j) /
-                (beta_j - alpha_j)
-            )
-        return new_points
-    else:
-        for idxState in range(points.shape[1]):
-            alpha_j = np.float64(box[idxState][0])
-            beta_j = np.float64(box[idxState][1])
-            shift_points[:, idxState] = (
-                (points[:, idxState] - alpha_j) /
-                (beta_j - alpha_j)
-            )
-        return shift_points
+    """
+    degree combinations and coefficients of the bernstein polynomial,
+    f is evaluated once on the batch of all grid points
+    output_index: index of one output, or a list of indices
+    for which one row of coefficients per output is returned
+    """
+    all_comb_lists, all_points = bernstein_grid(d, box)
+    values = f(all_points)[output_index]
+    return all_comb_lists, values * bernstein_binomials(d)
+
+
+def bernstein_grid(d, box):
+    """
+    all degree combinations of the bernstein polynomial, one per row,
+    and the corresponding grid points of the box as a (N, m) array
+    """
+    all_comb_lists = degree_comb_lists(d, len(d))
+    d = np.asarray(d)
+    box = np.asarray(box, dtype=np.float64)
+    # linear transformation from I=[0,1]^m to the box
+    alpha = box[:, 0]
+    beta = box[:, 1]
+    all_points = (beta - alpha) * (all_comb_lists / d) + alpha
+    return all_comb_lists, all_points
+
+
+def bernstein_binomials(d):
+    """
+    binomial weights prod_j comb(d_j, k_j) in the order of bernstein_grid
+    """
+    weights = np.ones(1)
+    for d_j in d:
+        weights = np.outer(weights, comb(d_j, np.arange(d_j + 1))).flatten()
+    return weights
+
+
+def bernstein_to_monomial(coeffs, d):
+    """
+    dense monomial coefficients of a bernstein polynomial in the
+    normalized variables y_j = (x_j - alpha_j) / (beta_j - alpha_j)
+    coeffs: coefficients in the order of bernstein_grid, including the
+    binomial weights, as returned by nn_poly_approx_bernstein_cuda
+    return: tensor of shape (d_1+1, ..., d_m+1) whose entry
+    [l_1, ..., l_m] is the coefficient of y_1^l_1 * ... * y_m^l_m
+    """
+    monomials = np.reshape(
+        np.asarray(coeffs, dtype=np.float64),
+        [d_j + 1 for d_j in d]
+    )
+    for j, d_j in enumerate(d):
+        monomials = np.moveaxis(np.tensordot(
+            monomials, bernstein_basis_to_monomial(d_j), axes=([j], [0])
+        ), -1, j)
+    return monomials
+
+
+def bernstein_basis_to_monomial(d_j):
+    """
+    matrix whose k-th row holds the monomial coefficients in y of
+    y^k * (1-y)^(d_j-k), its entries are exact integers
+    """
+    k = np.arange(d_j + 1)
+    # y^k * (1-y)^(d_j-k) = sum_i comb(d_j-k, i-k) * (-1)^(i-k) * y^i
+    to_y = np.round(comb(d_j - k[:, None], k[None, :] - k[:, None]))
+    to_y *= (-1.0)**(k[None, :] - k[:, None])
+    return to_y
+
+
+def bernstein_conversion_error(coeffs, d):
+    """
+    upper bound of the difference between the bernstein polynomial and
+    the rounded monomial coefficients of bernstein_to_monomial on the box
+    the contraction along dimension j sums d_j + 1 products with exact
+    integers, so each coefficient is off by at most gamma_n times the
+    same contractions in absolute values, n = sum_j (d_j + 1), and every
+    monomial is at most 1 in absolute value on the box
+    """
+    bound = np.abs(np.reshape(
+        np.asarray(coeffs, dtype=np.float64),
+        [d_j + 1 for d_j in d]
+    ))
+    for j, d_j in enumerate(d):
+        bound = np.moveaxis(np.tensordot(
+            bound, np.abs(bernstein_basis_to_monomial(d_j)), axes=([j], [0])
+        ), -1, j)
+    n = sum(int(d_j) + 1 for d_j in d)
+    u = np.finfo(np.float64).eps / 2
+    gamma_n = n * u / (1 - n * u)
+    # the float sums of the bound itself are off by at most gamma_m
+    m = n + bound.size
+    gamma_m = m * u / (1 - m * u)
+    return gamma_n * np.sum(bound) / (1 - gamma_m) * (1 + 4 * u)
+
+
+def monomial_to_flowstar(monomials, box, var_name='x'):
+    """
+    expression string of a dense monomial coefficient tensor in the
+    normalized variables of the box that can be parsed by Expression_AST
+    of Flow*, the normalization is left to its interval arithmetic
+    """
+    normalized = [
+        '((' + var_name + str(j) + ' - ({:.16e})) / ({:.16e} - ({:.16e})))'
+        .format(alpha_j, beta_j, alpha_j)
+        for j, (alpha_j, beta_j) in enumerate(
+            np.asarray(box, dtype=np.float64)
+        )
+    ]
+    terms = []
+    for orders in np.ndindex(*monomials.shape):
+        coeff = monomials[orders]
+        if coeff == 0:
+            continue
+        factors = []
+        for j, order in enumerate(orders):
+            if order == 1:
+                factors.append(normalized[j])
+            elif order > 1:
+                factors.append(normalized[j] + '^' + str(order))
+        term = '{:.16e}'.format(abs(coeff))
+        if factors:
+            term = term + '*' + '*'.join(factors)
+        if not terms:
+            terms.append('-' + term if coeff < 0 else term)
+        else:
+            terms.append(('- ' if coeff < 0 else '+ ') + term)
+    if not terms:
+        return '0'
+    return ' '.join(terms)
+
+
+def monomial_to_arrays(monomials, box):
+    """
+    exponents and coefficients of the nonzero terms of a dense monomial
+    coefficient tensor as contiguous arrays, one row of exponents of
+    type int32 and one float64 coefficient per term, and the box of the
+    normalized variables as one row [alpha_j, beta_j] per variable,
+    they expose the buffer protocol to the flow* drivers
+    """
+    monomials = np.asarray(monomials, dtype=np.float64)
+    exponents = np.argwhere(monomials != 0)
+    coefficients = monomials[tuple(exponents.T)]
+    return (
+        np.ascontiguousarray(exponents, dtype=np.int32),
+        np.ascontiguousarray(coefficients, dtype=np.float64),
+        np.ascontiguousarray(box, dtype=np.float64)
+    )
 
 
 step = -1
@@ -133,149 +218,619 @@ def bernstein_error_partition_cuda(
     output_index,
     activation,
     filename,
+    layer_cache=None,
+    coeffs=None,
+    ceiling=None
 ):
+    """
+    upper bound of the approximation error between the network
+    and its bernstein polynomial on the input box
+    output_index: index of one output, or a list of indices whose
+    errors are bounded together with one forward pass per sample batch,
+    a list of errors is returned in that case
+    layer_cache: memo of the layer bounds of this step, see lipschitz
+    coeffs: bernstein coefficients of the outputs if already computed,
+    as returned by nn_poly_approx_bernstein_cuda
+    ceiling: the uniform grid is sampled coarse to fine and the sampling
+    stops once an error bound is proved to exceed the ceiling, the
+    errors returned then are below the bounds and one is above ceiling
+    """
     global step
     step += 1
     import error_bound
     eps = error_bound.error_bound
     input_dim = len(degree_bound)
-    lips, network_output_range = lipschitz(
-        nn,
-        input_box,
-        output_index,
-        activation
-    )
+    if isinstance(output_index, list):
+        output_indices = output_index
+    else:
+        output_indices = [output_index]
+    adaptive = getattr(error_bound, 'adaptive_partition', False)
+    incremental = getattr(error_bound, 'incremental', False) and not adaptive
+    method = getattr(error_bound, 'lipschitz_method', 'layer')
+    if not adaptive:
+        # the adaptive partition bounds a Lipschitz constant per sub box
+        with profiler.phase('lipschitz'):
+            if incremental:
+                state = incremental_envelope(
+                    nn,
+                    filename,
+                    input_box,
+                    output_indices,
+                    activation,
+                    eps,
+                    getattr(error_bound, 'incremental_tolerance', 0.1),
+                    layer_cache=layer_cache,
+                    method=method
+                )
+                lips_all = state['lips']
+            else:
+                lips_all = lipschitz_outputs(
+                    nn,
+                    input_box,
+                    output_indices,
+                    activation,
+                    cache=layer_cache,
+                    method=method
+                )
+        # the grid is shared by all outputs and fine enough for each of them
+        lips = np.max(lips_all)
 
-    distance_estimate = 0
-    for idxState in range(input_dim):
-        diff = np.diff(input_box[idxState])[0]
-        if diff > distance_estimate:
-            distance_estimate = diff
+        distance_estimate = 0
+        for idxState in range(input_dim):
+            diff = np.diff(input_box[idxState])[0]
+            if diff > distance_estimate:
+                distance_estimate = diff
 
-    LD_estimate = lips * distance_estimate * np.sqrt(input_dim)
-    num_partition = int(np.ceil(LD_estimate // eps + 1))
+        LD_estimate = lips * distance_estimate * np.sqrt(input_dim)
+        num_partition = int(np.ceil(LD_estimate // eps + 1))
 
-    partition = [num_partition] * input_dim
+        partition = [num_partition] * input_dim
+        partition_box = np.zeros(input_dim, dtype=np.float64)
+        for j in range(input_dim):
+            alpha_j = np.float64(input_box[j][0])
+            beta_j = np.float64(input_box[j][1])
+            partition_box[j] = (beta_j - alpha_j) / num_partition
 
     print('---------------' + filename + '-------------------')
     print('step: {}'.format(step))
     print('degree bound: {}'.format(degree_bound))
-    print('number of partition: {}'.format(num_partition))
-    print('Lipschitz constant: {}'.format(lips))
-
-    all_comb_lists = sample_points_list(partition, input_dim)
+    if not adaptive:
+        print('number of partition: {}'.format(num_partition))
+        print('Lipschitz constant: {}'.format(lips_all))
+        profiler.set('partition', num_partition)
 
-    if isinstance(lips, np.ndarray):
-        lips = lips[0]
-
-    sample_times = (num_partition + 1)**input_dim
-    large_sample_times = False
-    if sample_times < 1e7:
-        all_sample_points = np.zeros(
-            ((num_partition + 1)**input_dim, input_dim),
-            dtype=np.float32
-        )
-        all_shift_points = np.zeros(
-            ((num_partition + 1)**input_dim, input_dim),
-            dtype=np.float32
+    # coefficients of all outputs from one evaluation of the grid
+    if coeffs is None:
+        order_list, coeffs_list = nn_poly_approx_bernstein_cuda(
+            f,
+            degree_bound,
+            input_box,
+            output_indices
         )
     else:
-        large_sample_times = True
-        os.system('rm ./cach.hdf5')
-        hdf5_store = h5py.File('./cach.hdf5', 'a')
-        all_sample_points = hdf5_store.create_dataset(
-            "all_sample_points",
-            (sample_times, input_dim),
-            compression='gzip'
-        )
-        all_shift_points = hdf5_store.create_dataset(
-            "all_shift_points",
-            (sample_times, input_dim),
-            compression='gzip'
-        )
+        order_list = degree_comb_lists(degree_bound, input_dim)
+        coeffs_list = np.reshape(coeffs, (len(output_indices), -1))
+    polys = [
+        polyval(order_list, degree_bound, coeffs_i, 'test')
+        for coeffs_i in coeffs_list
+    ]
 
-    partition_box = np.zeros(input_dim, dtype=np.float64)
-    for j in range(input_dim):
-        alpha_j = np.float64(input_box[j][0])
-        beta_j = np.float64(input_box[j][1])
-        partition_box[j] = (beta_j - alpha_j) / num_partition
-
-    for idxState in range(input_dim):
-        alpha_j = np.float64(input_box[idxState][0])
-        beta_j = np.float64(input_box[idxState][1])
-        all_sample_points[:, idxState] = (
-            (beta_j - alpha_j) *
-            (points_list(all_comb_lists, idxState) / num_partition)
-            + alpha_j
-        )
-        all_shift_points = point_shift_all(
-            all_sample_points,
+    workers = getattr(error_bound, 'workers', 1) or os.cpu_count()
+    # batch size of the sampling in this process
+    batch_size = sample_batch_size(nn, degree_bound)
+
+    with profiler.phase('error_sampling'):
+        if adaptive:
+            error = np.array([
+                bernstein_error_partition_adaptive(
+                    nn,
+                    nn.forward,
+                    poly,
+                    input_box,
+                    output_i,
+                    activation,
+                    eps,
+                    batch_size=batch_size,
+                    layer_cache=layer_cache,
+                    method=method
+                )
+                for poly, output_i in zip(polys, output_indices)
+            ])
+        elif incremental:
+            sample_error = incremental_sample_error(
+                state,
+                nn,
+                polys,
+                input_box,
+                batch_size
+            )
+            error = sample_error + lips_all * LA.norm(state['spacing'])
+        elif ceiling is not None:
+            margin = lips_all * LA.norm(partition_box)
+            sample_error = budget_sample_error(
+                (nn, polys, output_indices, partition, input_box, batch_size),
+                margin,
+                ceiling
+            )
+            error = sample_error + margin
+        else:
+            # only the running max of the sampled error is kept
+            grid_size = (num_partition + 1)**input_dim
+            print('number of sampling points: {}'.format(grid_size))
+            profiler.count('samples', grid_size)
+            sharded = workers > 1 and grid_size > min_shard_size
+            if sharded:
+                # the batches of the forked workers share the memory
+                batch_size = sample_batch_size(nn, degree_bound, workers)
+            shard_args = (
+                nn, polys, output_indices, partition, input_box, batch_size
+            )
+            if sharded:
+                sample_error = sharded_sample_error(
+                    shard_args, grid_size, workers
+                )
+            else:
+                sample_error = shard_sample_error(
+                    shard_args, 0, grid_size, verbose=True
+                )
+            error = sample_error + lips_all * LA.norm(partition_box)
+
+    print('bp to nn error: {}'.format(error))
+
+    if isinstance(output_index, list):
+        return list(error)
+    return error[0]
+
+
+def lipschitz_outputs(
+    nn,
+    input_box,
+    output_indices,
+    activation,
+    cache=None,
+    method='layer'
+):
+    """
+    Lipschitz constants of several outputs on the input box
+    """
+    lips_all = []
+    for output_i in output_indices:
+        lips, _ = lipschitz(
+            nn,
             input_box,
-            large_sample_times,
-            all_shift_points
+            output_i,
+            activation,
+            cache=cache,
+            method=method
         )
-    if large_sample_times:
-        hdf5_store.close()
+        if isinstance(lips, np.ndarray):
+            lips = lips[0]
+        lips_all.append(lips)
+    return np.array(lips_all)
 
-    order_list, coeffs_list = nn_poly_approx_bernstein_cuda(
-        f,
-        degree_bound,
-        input_box,
-        output_index
-    )
-    poly = polyval(order_list, degree_bound, coeffs_list, 'test')
 
-    if large_sample_times:
-        with h5py.File('./cach.hdf5', 'r') as hdf5_store:
-            all_sample_points = hdf5_store['all_sample_points'][:]
-            all_shift_points = hdf5_store['all_shift_points'][:]
+# Lipschitz constants, sample lattice and network outputs kept between
+# the control steps in the incremental mode, per network and outputs
+incremental_states = {}
+# larger lattice blocks are sampled without keeping the network outputs
+incremental_max_points = 10**7
 
-    if filename[:4] == 'nn_5' or filename[:4] == 'nn_2':
-        batch_size = 1e5
-    else:
-        batch_size = 1e7
-    batch_num = math.ceil(all_sample_points.shape[0] / batch_size)
-    batch_idx = np.arange(1, batch_num) * batch_size
-    batch_idx = batch_idx.astype(int)
-    all_sample_points_batches = np.split(all_sample_points, batch_idx, axis=0)
-    all_shift_points_batches = np.split(all_shift_points, batch_idx, axis=0)
-
-    poly_results = np.zeros((all_sample_points.shape[0], 1))
-    nn_results = np.zeros((all_sample_points.shape[0], 1))
-
-    with U.make_session() as sess:
-        sess.run(tf.global_variables_initializer())
-        batch_pointer = 0
-        print(
-            'number of sampling points: {}'.format(all_sample_points.shape[0])
-        )
-        for sample_points, shift_points in zip(
-            all_sample_points_batches,
-            all_shift_points_batches
+
+def incremental_envelope(
+    nn,
+    filename,
+    input_box,
+    output_indices,
+    activation,
+    eps,
+    tolerance,
+    layer_cache=None,
+    method='layer'
+):
+    """
+    Lipschitz constants and sample lattice of an envelope of the box,
+    the box enlarged by tolerance times its width on every side
+    they are reused while the boxes of the next steps stay inside the
+    envelope and do not shrink below it by more than the same factor,
+    a Lipschitz constant of the envelope is one of every box inside it
+    """
+    input_box = np.asarray(input_box, dtype=np.float64)
+    input_dim = input_box.shape[0]
+    width = input_box[:, 1] - input_box[:, 0]
+    key = (filename, activation, tuple(output_indices))
+    state = incremental_states.get(key)
+    if state is not None:
+        envelope = state['envelope']
+        envelope_width = envelope[:, 1] - envelope[:, 0]
+        if (
+            np.all(input_box[:, 0] >= envelope[:, 0]) and
+            np.all(input_box[:, 1] <= envelope[:, 1]) and
+            np.all(width * (1 + 2 * tolerance)**2 >= envelope_width)
         ):
-            batch_range = range(
+            print('reuse the envelope {}'.format(envelope.tolist()))
+            return state
+
+    envelope = np.stack([
+        input_box[:, 0] - tolerance * width,
+        input_box[:, 1] + tolerance * width
+    ], axis=1)
+    lips_all = lipschitz_outputs(
+        nn,
+        envelope,
+        output_indices,
+        activation,
+        cache=layer_cache,
+        method=method
+    )
+    # lattice of the uniform partition of the envelope, as for the box
+    envelope_width = envelope[:, 1] - envelope[:, 0]
+    distance = np.max(envelope_width)
+    num_partition = int(np.ceil(
+        np.max(lips_all) * distance * np.sqrt(input_dim) // eps + 1
+    ))
+    # a box reusing the envelope is at least one spacing wide, so it
+    # contains a lattice point in every dimension
+    num_partition = max(num_partition, int(np.ceil((1 + 2 * tolerance)**2)))
+    state = {
+        'envelope': envelope,
+        'lips': lips_all,
+        'num_partition': num_partition,
+        'spacing': envelope_width / num_partition,
+        'outputs': list(output_indices),
+        'lower': None,
+        'upper': None,
+        'values': None
+    }
+    incremental_states[key] = state
+    print('new envelope {}'.format(envelope.tolist()))
+    return state
+
+
+def incremental_sample_error(state, nn, polys, input_box, batch_size):
+    """
+    max error of each output on the lattice points of the envelope
+    inside the box, the network outputs on the lattice points of the
+    previous step are reused, any point of the box is within one
+    spacing of a sample in every dimension
+    """
+    input_box = np.asarray(input_box, dtype=np.float64)
+    alpha = input_box[:, 0]
+    beta = input_box[:, 1]
+    origin = state['envelope'][:, 0]
+    spacing = state['spacing']
+    lower = np.ceil((alpha - origin) / spacing).astype(np.int64)
+    upper = np.floor((beta - origin) / spacing).astype(np.int64)
+    # rounding of the division may leave the lattice point outside
+    lower[origin + lower * spacing < alpha] += 1
+    upper[origin + upper * spacing > beta] -= 1
+    lower = np.clip(lower, 0, state['num_partition'])
+    upper = np.clip(upper, lower, state['num_partition'])
+    shape = tuple(int(n) for n in upper - lower + 1)
+    grid_size = 1
+    for n in shape:
+        grid_size *= n
+
+    keep = grid_size <= incremental_max_points
+    values = None
+    known = None
+    if keep:
+        values = np.empty(shape + (len(polys),), dtype=np.float64)
+        known = np.zeros(shape, dtype=bool)
+        if state['values'] is not None:
+            # copy the overlap of the lattice blocks of the two steps
+            overlap_lower = np.maximum(lower, state['lower'])
+            overlap_upper = np.minimum(upper, state['upper'])
+            if np.all(overlap_lower <= overlap_upper):
+                new_block = tuple(
+                    slice(first - l_new, last - l_new + 1)
+                    for first, last, l_new in
+                    zip(overlap_lower, overlap_upper, lower)
+                )
+                old_block = tuple(
+                    slice(first - l_old, last - l_old + 1)
+                    for first, last, l_old in
+                    zip(overlap_lower, overlap_upper, state['lower'])
+                )
+                values[new_block] = state['values'][old_block]
+                known[new_block] = True
+
+    sample_error = np.zeros(len(polys))
+    num_evaluated = 0
+    for index in grid_index_chunks(upper - lower, batch_size):
+        sample_points = origin + (index + lower) * spacing
+        shift_points = (sample_points - alpha) / (beta - alpha)
+        if keep:
+            block_index = tuple(index.T)
+            nn_results = values[block_index]
+            missing = ~known[block_index]
+            if np.any(missing):
+                nn_results[missing] = nn.forward(
+                    sample_points[missing]
+                )[:, state['outputs']]
+                values[block_index] = nn_results
+                num_evaluated += np.count_nonzero(missing)
+        else:
+            nn_results = nn.forward(sample_points)[:, state['outputs']]
+            num_evaluated += sample_points.shape[0]
+        for i, poly in enumerate(polys):
+            poly_results = poly(shift_points)
+            sample_error[i] = max(
+                sample_error[i],
+                np.max(np.absolute(poly_results[:, 0] - nn_results[:, i]))
+            )
+
+    state['lower'] = lower if keep else None
+    state['upper'] = upper if keep else None
+    state['values'] = values
+    print('number of sampling points: {}'.format(grid_size))
+    print('number of network evaluations: {}'.format(num_evaluated))
+    profiler.count('samples', grid_size)
+    profiler.count('evaluations', num_evaluated)
+    return sample_error
+
+
+def shard_sample_error(shard_args, start, stop, verbose=False):
+    """
+    max error of each output over the grid points of flat index
+    start to stop, evaluated in batches
+    """
+    nn, polys, output_indices, partition, input_box, batch_size = shard_args
+    sample_error = np.zeros(len(output_indices))
+    batch_pointer = start
+    for sample_points, shift_points in sample_points_chunks(
+        partition,
+        input_box,
+        batch_size,
+        start,
+        stop
+    ):
+        if verbose:
+            print('batch_range: {}'.format(range(
                 batch_pointer,
                 batch_pointer + sample_points.shape[0]
-            )
-            print('batch_range: {}'.format(batch_range))
-            poly_results[batch_range, :] = poly(
-                sess,
-                shift_points
-            )
-            nn_results[batch_range, :] = nn(
-                sess,
-                sample_points
-            )
-            batch_pointer += sample_points.shape[0]
+            )))
+        sample_error = np.maximum(sample_error, batch_sample_error(
+            nn, polys, output_indices, sample_points, shift_points
+        ))
+        batch_pointer += sample_points.shape[0]
+    return sample_error
+
+
+def batch_sample_error(nn, polys, output_indices, sample_points, shift_points):
+    """
+    max error of each output on a batch of sample points
+    """
+    nn_results = nn.forward(sample_points)
+    return np.array([
+        np.max(np.absolute(poly(shift_points)[:, 0] - nn_results[:, output_i]))
+        for poly, output_i in zip(polys, output_indices)
+    ])
+
+
+def budget_sample_error(shard_args, margin, ceiling):
+    """
+    max error of each output over the grid sampled coarse to fine,
+    the sampling stops once the error plus margin of an output exceeds
+    the ceiling, the error bound of the whole grid would then too
+    """
+    nn, polys, output_indices, partition, input_box, batch_size = shard_args
+    partition = np.asarray(partition, dtype=np.int64)
+    box = np.asarray(input_box, dtype=np.float64)
+    sample_error = np.zeros(len(output_indices))
+    samples = 0
+    exceeded = np.any(margin > ceiling)
+    if not exceeded:
+        for index in coarse_to_fine_index_chunks(partition, batch_size):
+            shift_points = index / partition
+            sample_points = (box[:, 1] - box[:, 0]) * shift_points + box[:, 0]
+            sample_error = np.maximum(sample_error, batch_sample_error(
+                nn, polys, output_indices, sample_points, shift_points
+            ))
+            samples += index.shape[0]
+            exceeded = np.any(sample_error + margin > ceiling)
+            if exceeded:
+                break
+    if exceeded:
+        print('error above {} after {} of {} samples'.format(
+            ceiling, samples, int(np.prod(partition + 1))
+        ))
+        profiler.set('early_exit', True)
+    else:
+        print('number of sampling points: {}'.format(samples))
+    profiler.count('samples', samples)
+    return sample_error
+
+
+# arguments of the shards, inherited by the forked workers
+shard_state = None
+# smaller grids are not worth forking for
+min_shard_size = 10**5
+
+
+def shard_worker(shard_range):
+    return shard_sample_error(shard_state, *shard_range)
+
+
+def sharded_sample_error(shard_args, grid_size, workers):
+    """
+    split the grid index space into shards evaluated by a pool of
+    forked workers and reduce the max error of each output
+    """
+    global shard_state
+    # a few shards per worker to balance the load
+    num_shards = min(4 * workers, -(-grid_size // min_shard_size))
+    bounds = np.linspace(0, grid_size, num_shards + 1).astype(np.int64)
+    shard_ranges = [
+        (int(start), int(stop))
+        for start, stop in zip(bounds[:-1], bounds[1:])
+        if stop > start
+    ]
+    print('shards: {} on {} workers'.format(len(shard_ranges), workers))
+    shard_state = shard_args
+    # fork keeps the network and polynomials without pickling them and
+    # works inside the interpreter embedded in the flow* driver
+    pool = multiprocessing.get_context('fork').Pool(workers)
+    try:
+        shard_errors = pool.map(shard_worker, shard_ranges, chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
+        shard_state = None
+    return np.max(np.array(shard_errors), axis=0)
+
+
+def available_memory():
+    """
+    bytes of memory available to new allocations
+    """
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+    except (ValueError, OSError, AttributeError):
+        return 2**30
 
-    sample_error = np.max(np.absolute(poly_results[:, 0] - nn_results[:, 0]))
-    error = sample_error + lips * LA.norm(partition_box)
-    print('bp to nn error: {}'.format(error))
 
+def sample_batch_size(nn, degree_bound, workers=1, memory_fraction=0.25):
+    """
+    number of sample points per batch such that the batches of all
+    workers take a fraction of the available memory
+    """
+    input_dim = len(degree_bound)
+    # float64 arrays alive per point: sample and shifted points, two
+    # layer outputs and the partial contraction of a polynomial
+    poly_width = 1
+    for d_j in degree_bound[1:]:
+        poly_width *= int(d_j) + 1
+    layer_width = max(
+        [nn.num_of_inputs, nn.num_of_outputs] +
+        [int(n) for n in nn.network_structure]
+    )
+    bytes_per_point = 8 * (2 * input_dim + 2 * layer_width + 2 * poly_width)
+    batch_size = available_memory() * memory_fraction / (
+        bytes_per_point * max(workers, 1)
+    )
+    return int(min(max(batch_size, 1e3), 1e7))
+
+
+def bernstein_error_partition_adaptive(
+    nn,
+    nn_eval,
+    poly,
+    input_box,
+    output_index,
+    activation,
+    eps,
+    max_partition=16,
+    max_depth=10,
+    batch_size=1e5,
+    layer_cache=None,
+    method='layer'
+):
+    """
+    upper bound of the approximation error with adaptive partitions
+    every sub box is sampled with per-dimension partition counts derived
+    from its local Lipschitz constant, capped by max_partition, and it is
+    bisected only while its local sample error plus Lipschitz slack
+    exceeds eps and the cap prevented a fine enough grid
+    the partition is only as fine as eps needs, so the result stays
+    close to eps, it takes far fewer samples than the uniform grid on
+    boxes with long and short sides, and may take more on square ones
+    nn_eval: evaluates the network on a batch of points
+    poly: bernstein polynomial of the network on the whole input box
+    """
+    input_box = np.asarray(input_box, dtype=np.float64)
+    input_dim = input_box.shape[0]
+    alpha = input_box[:, 0]
+    beta = input_box[:, 1]
+    error = 0
+    num_samples = 0
+    num_boxes = 0
+    sub_boxes = [(input_box, 0)]
+    while sub_boxes:
+        sub_box, depth = sub_boxes.pop()
+        lips, _ = lipschitz(
+            nn,
+            sub_box,
+            output_index,
+            activation,
+            cache=layer_cache,
+            method=method
+        )
+        width = sub_box[:, 1] - sub_box[:, 0]
+        partition = np.floor(lips * width * np.sqrt(input_dim) / eps) + 1
+        capped = np.any(partition > max_partition)
+        partition = np.minimum(partition, max_partition)
+        partition_box = width / partition
+        sample_error = 0
+        for sample_points, _ in sample_points_chunks(
+            partition,
+            sub_box,
+            batch_size
+        ):
+            # the polynomial is defined on the whole input box
+            shift_points = (sample_points - alpha) / (beta - alpha)
+            poly_results = poly(shift_points)
+            nn_results = nn_eval(sample_points)
+            sample_error = max(sample_error, np.max(np.absolute(
+                poly_results[:, 0] - nn_results[:, output_index]
+            )))
+            num_samples += sample_points.shape[0]
+        local_error = sample_error + lips * LA.norm(partition_box)
+        if local_error > eps and capped and depth < max_depth:
+            # bisect the dimension with the widest cell
+            j = np.argmax(partition_box)
+            middle = (sub_box[j, 0] + sub_box[j, 1]) / 2
+            lower_box = sub_box.copy()
+            lower_box[j, 1] = middle
+            upper_box = sub_box.copy()
+            upper_box[j, 0] = middle
+            sub_boxes.append((lower_box, depth + 1))
+            sub_boxes.append((upper_box, depth + 1))
+        else:
+            error = max(error, local_error)
+            num_boxes += 1
+    print('number of sub boxes: {}'.format(num_boxes))
+    print('number of sampling points: {}'.format(num_samples))
+    profiler.count('samples', num_samples)
     return error
 
 
-def lipschitz(NN_controller, network_input_box, output_index, activation):
+def lipschitz(
+    NN_controller,
+    network_input_box,
+    output_index,
+    activation,
+    cache=None,
+    method='layer'
+):
+    """
+    Lipschitz constant of one output of the network on the input box
+    cache: dict memoizing the layer bounds per (layer, box), it can be
+    shared by all calls of a control step
+    method: 'layer' for the product of the layer constants, 'jacobian'
+    for the interval Jacobian bound of lipschitz_jacobian, 'min' for
+    the smaller of both, each is an upper bound
+    """
+    if method == 'jacobian':
+        return lipschitz_jacobian(
+            NN_controller, network_input_box, output_index, cache
+        ), 0
+    if method == 'min':
+        return min(
+            lipschitz(
+                NN_controller, network_input_box, output_index,
+                activation, cache
+            )[0],
+            lipschitz_jacobian(
+                NN_controller, network_input_box, output_index, cache
+            )
+        ), 0
     weight_all_layer = NN_controller.weights
     bias_all_layer = NN_controller.bias
     scale_factor = NN_controller.scale_factor
@@ -284,180 +839,294 @@ def lipschitz(NN_controller, network_input_box, output_index, activation):
 
     layers = len(bias_all_layer)
     lips = 1
-    input_range_layer = network_input_box
+    input_range_layer = np.asarray(network_input_box, dtype=np.float64)
     for j in range(layers):
         if j < layers - 1:
             weight_j = weight_all_layer[j]
+            layer_key = j
         else:
             weight_j = np.reshape(weight_all_layer[j][output_index], (1, -1))
+            layer_key = (j, output_index)
         if j < layers - 1:
             bias_j = bias_all_layer[j]
         else:
             bias_j = np.reshape(bias_all_layer[j][output_index], (1, -1))
-        lipschitz_j = lipschitz_layer(
-            weight_j,
-            bias_j,
-            input_range_layer,
-            activation_all_layer[j]
-        )
+        key = (layer_key, input_range_layer.tobytes())
+        if cache is not None and key in cache:
+            lipschitz_j, input_range_layer = cache[key]
+        else:
+            lipschitz_j, input_range_layer = lipschitz_layer(
+                weight_j,
+                bias_j,
+                input_range_layer,
+                activation_all_layer[j]
+            )
+            if cache is not None:
+                cache[key] = (lipschitz_j, input_range_layer)
         lips = lips * lipschitz_j
-        input_range_layer, _ = output_range_layer(
-            weight_j,
-            bias_j,
-            input_range_layer,
-            activation_all_layer[j]
-        )
     return lips * scale_factor, 0
 
 
+def lipschitz_jacobian(
+    NN_controller,
+    network_input_box,
+    output_index,
+    cache=None
+):
+    """
+    Lipschitz constant of one output of the network on the input box
+    from an interval matrix that contains its Jacobian at every point,
+    every neuron contributes the range of its own activation derivative
+    on its pre-activation range instead of the max over the layer
+    the 2-norm of the largest magnitudes of the interval entries bounds
+    the norm of every Jacobian in it
+    cache: dict memoizing the hidden layer Jacobian per box
+    """
+    weight_all_layer = NN_controller.weights
+    bias_all_layer = NN_controller.bias
+    activation_all_layer = NN_controller.activations
+    layers = len(bias_all_layer)
+
+    input_range = np.asarray(network_input_box, dtype=np.float64)
+    key = ('jacobian', input_range.tobytes())
+    if cache is not None and key in cache:
+        jacobian_lower, jacobian_upper, output_range = cache[key]
+    else:
+        jacobian_lower = np.eye(input_range.shape[0])
+        jacobian_upper = np.eye(input_range.shape[0])
+        output_range = input_range
+        for j in range(layers - 1):
+            jacobian_lower, jacobian_upper, output_range = jacobian_layer(
+                weight_all_layer[j],
+                bias_all_layer[j],
+                output_range,
+                activation_all_layer[j],
+                jacobian_lower,
+                jacobian_upper
+            )
+        if cache is not None:
+            cache[key] = (jacobian_lower, jacobian_upper, output_range)
+
+    jacobian_lower, jacobian_upper, _ = jacobian_layer(
+        np.reshape(weight_all_layer[-1][output_index], (1, -1)),
+        np.reshape(bias_all_layer[-1][output_index], (1, -1)),
+        output_range,
+        activation_all_layer[-1],
+        jacobian_lower,
+        jacobian_upper
+    )
+    magnitude = np.maximum(np.abs(jacobian_lower), np.abs(jacobian_upper))
+    return LA.norm(magnitude, 2) * np.abs(NN_controller.scale_factor)
+
+
+def jacobian_layer(
+    weight,
+    bias,
+    input_range_layer,
+    activation,
+    jacobian_lower,
+    jacobian_upper
+):
+    """
+    interval Jacobian of the network up to this layer from the one up
+    to its input, diag(activation derivative) * weight * jacobian
+    return: bounds of the Jacobian and the output range of the layer
+    """
+    input_min, input_max = pre_activation_range(
+        weight, bias, input_range_layer
+    )
+    derivative_min, derivative_max = activation_derivative_range(
+        input_min, input_max, activation
+    )
+    weight_pos = np.maximum(weight, 0)
+    weight_neg = np.minimum(weight, 0)
+    product_lower = weight_pos @ jacobian_lower + weight_neg @ jacobian_upper
+    product_upper = weight_pos @ jacobian_upper + weight_neg @ jacobian_lower
+    # the derivatives are nonnegative
+    derivative_min = derivative_min[:, None]
+    derivative_max = derivative_max[:, None]
+    jacobian_lower = np.minimum(
+        derivative_min * product_lower, derivative_max * product_lower
+    )
+    jacobian_upper = np.maximum(
+        derivative_min * product_upper, derivative_max * product_upper
+    )
+    # copies, ReLU works in place
+    output_range = np.stack([
+        activation_functions[activation](input_min.copy()),
+        activation_functions[activation](input_max.copy())
+    ], axis=1)
+    return jacobian_lower, jacobian_upper, output_range
+
+
+def sigmoid_derivative(x):
+    y = 1/(1+np.exp(-x))
+    return y * (1 - y)
+
+
+def tanh_derivative(x):
+    return 1 - np.tanh(x)**2
+
+
+# derivatives of the smooth activations, they peak at 0 and decrease
+# with the distance to it
+smooth_derivatives = {
+    'sigmoid': sigmoid_derivative,
+    'tanh': tanh_derivative
+}
+
+
+def activation_derivative_range(input_min, input_max, activation):
+    """
+    range of the derivative of the activation of every neuron on its
+    pre-activation range, for ReLU the generalized derivative at 0
+    is [0, 1]
+    """
+    if activation == 'ReLU':
+        derivative_min = (input_min > 0).astype(np.float64)
+        derivative_max = (input_max >= 0).astype(np.float64)
+        return derivative_min, derivative_max
+    if activation not in smooth_derivatives:
+        raise ValueError('unsupported activation {}'.format(activation))
+    derivative = smooth_derivatives[activation]
+    derivative_min = np.minimum(derivative(input_min), derivative(input_max))
+    derivative_max = derivative(np.clip(0, input_min, input_max))
+    return derivative_min, derivative_max
+
+
 def lipschitz_layer(weight, bias, input_range_layer, activation):
-    neuron_dim = bias.shape[0]
+    """
+    Lipschitz constant of one layer on its input range
+    return: the constant and the output range of the layer
+    """
     output_range_box, new_weight = output_range_layer(
         weight,
         bias,
         input_range_layer,
         activation
     )
+    output_min = output_range_box[:, 0]
+    output_max = output_range_box[:, 1]
     if activation == 'ReLU':
-        return LA.norm(new_weight, 2)
+        if len(new_weight) == 0:
+            return 0.0, output_range_box
+        return LA.norm(new_weight, 2), output_range_box
     if activation == 'sigmoid':
-        max_singular = 0
-        for j in range(neuron_dim):
-            range_j = output_range_box[j]
-            if range_j[0] > 0.5:
-                singular_j = range_j[0]*(1-range_j[0])
-            elif range_j[1] < 0.5:
-                singular_j = range_j[1]*(1-range_j[1])
-            else:
-                singular_j = np.array([0.25])
-            if max_singular < singular_j:
-                max_singular = singular_j
-        return max_singular*LA.norm(weight, 2)
+        singular = np.where(
+            output_min > 0.5,
+            output_min * (1 - output_min),
+            np.where(output_max < 0.5, output_max * (1 - output_max), 0.25)
+        )
     if activation == 'tanh':
-        max_singular = 0
-        for j in range(neuron_dim):
-            range_j = output_range_box[j]
-            if range_j[0] > 0:
-                singular_j = 1 - range_j[0]**2
-            elif range_j[1] < 0:
-                singular_j = 1 - range_j[1]**2
-            else:
-                singular_j = np.array([1])
-            if max_singular < singular_j:
-                max_singular = singular_j
-        return max_singular*LA.norm(weight, 2)
+        singular = np.where(
+            output_min > 0,
+            1 - output_min**2,
+            np.where(output_max < 0, 1 - output_max**2, 1.0)
+        )
+    return np.max(singular) * LA.norm(weight, 2), output_range_box
 
 
 def output_range_layer(weight, bias, input_range_layer, activation):
-    # solving LPs
-    neuron_dim = bias.shape[0]
-    output_range_box = []
+    """
+    exact range of all neurons of a layer on a box by interval arithmetic,
+    the minimum of w^T x over a box takes the lower bound where w > 0
+    and the upper bound where w < 0
+    return: (n, 2) array of output ranges and, for ReLU,
+    the weights of the neurons that may be active
+    """
+    input_min, input_max = pre_activation_range(
+        weight, bias, input_range_layer
+    )
     new_weight = []
-    for j in range(neuron_dim):
-        # c: weight of the j-th dimension
-        c = weight[j]
-        c = c.transpose()
-        b = bias[j]
-        # compute the minimal input
-        res_min = linprog(c, bounds=input_range_layer, options={"disp": False})
-        input_j_min = res_min.fun + b
-        # compute the minimal output
-        if activation == 'ReLU':
-            if input_j_min < 0:
-                output_j_min = np.array([0])
-            else:
-                output_j_min = input_j_min
-        if activation == 'sigmoid':
-            output_j_min = 1/(1+np.exp(-input_j_min))
-        if activation == 'tanh':
-            output_j_min = 2/(1+np.exp(-2*input_j_min))-1
-        # compute the maximal input
-        res_max = linprog(
-            -c,
-            bounds=input_range_layer,
-            options={"disp": False}
-        )
-        input_j_max = -res_max.fun + b
-        # compute the maximal output
-        if activation == 'ReLU':
-            if input_j_max < 0:
-                output_j_max = np.array([0])
-            else:
-                output_j_max = input_j_max
-                new_weight.append(weight[j])
-        if activation == 'sigmoid':
-            output_j_max = 1/(1+np.exp(-input_j_max))
-        if activation == 'tanh':
-            output_j_max = 2/(1+np.exp(-2*input_j_max))-1
-        output_range_box.append([output_j_min, output_j_max])
-    return output_range_box, new_weight
+    if activation == 'ReLU':
+        output_min = np.maximum(input_min, 0)
+        output_max = np.maximum(input_max, 0)
+        new_weight = weight[input_max >= 0]
+    if activation == 'sigmoid':
+        output_min = 1/(1+np.exp(-input_min))
+        output_max = 1/(1+np.exp(-input_max))
+    if activation == 'tanh':
+        output_min = np.tanh(input_min)
+        output_max = np.tanh(input_max)
+    return np.stack([output_min, output_max], axis=1), new_weight
+
+
+def pre_activation_range(weight, bias, input_range_layer):
+    """
+    range of weight * x + bias over the box of x by interval arithmetic
+    """
+    input_range_layer = np.asarray(input_range_layer, dtype=np.float64)
+    lower = input_range_layer[:, 0]
+    upper = input_range_layer[:, 1]
+    weight_pos = np.maximum(weight, 0)
+    weight_neg = np.minimum(weight, 0)
+    bias = np.reshape(bias, -1)
+    input_min = weight_pos @ lower + weight_neg @ upper + bias
+    input_max = weight_pos @ upper + weight_neg @ lower + bias
+    return input_min, input_max
 
 
 def degree_comb_lists(d, m):
-    # generate the degree combination list
-    if m == 1:
-        X = np.meshgrid(np.arange(d[0] + 1))
-        return [tuple(row) for row in X]
-    if m == 2:
-        x = np.arange(d[0] + 1)
-        y = np.arange(d[1] + 1)
-        X, Y = np.meshgrid(x, y)
-        grid = np.vstack((X.flatten(), Y.flatten()))
-        return grid.T
-    if m == 3:
-        x = np.arange(d[0] + 1)
-        y = np.arange(d[1] + 1)
-        z = np.arange(d[2] + 1)
-        X, Y, Z = np.meshgrid(x, y, z)
-        grid = np.vstack((X.flatten(), Y.flatten(), Z.flatten()))
-        return grid.T
-    if m == 4:
-        x = np.arange(d[0] + 1)
-        y = np.arange(d[1] + 1)
-        z = np.arange(d[2] + 1)
-        h = np.arange(d[3] + 1)
-        X, Y, Z, H = np.meshgrid(x, y, z, h)
-        grid = np.vstack((X.flatten(), Y.flatten(), Z.flatten(), H.flatten()))
-        return grid.T
-
-
-def sample_points_list(d, m):
-    # generate the degree combination list
-    if m == 1:
-        X = np.meshgrid(np.arange(d[0] + 1), sparse=True)
-        return X
-    if m == 2:
-        x = np.arange(d[0] + 1)
-        y = np.arange(d[1] + 1)
-        grid = np.meshgrid(x, y, sparse=True)
-        return grid
-    if m == 3:
-        x = np.arange(d[0] + 1)
-        y = np.arange(d[1] + 1)
-        z = np.arange(d[2] + 1)
-        grid = np.meshgrid(x, y, z, sparse=True)
-        return grid
-    if m == 4:
-        x = np.arange(d[0] + 1)
-        y = np.arange(d[1] + 1)
-        z = np.arange(d[2] + 1)
-        h = np.arange(d[3] + 1)
-        grid = np.meshgrid(x, y, z, h, sparse=True)
-        return grid
-
-
-def points_list(grid, axis):
-    for idxDim in range(len(grid)):
-        if idxDim != axis:
-            grid[idxDim] *= 0
-    points = sum(grid)
-    return points.flatten()
-
-    # degree_lists = []
-    # for j in range(m):
-    #     degree_lists.append(range(d[j]+1))
-    # all_comb_lists = list(itertools.product(*degree_lists))
-    # return all_comb_lists
+    # generate the degree combination list of any dimension
+    shape = [int(d_j) + 1 for d_j in d[:m]]
+    return np.indices(shape).reshape(m, -1).T
+
+
+def grid_index_chunks(d, chunk_size, start=0, stop=None):
+    """
+    lazily generate the index combinations of the grid
+    {0, ..., d_1} x ... x {0, ..., d_m}
+    in blocks of at most chunk_size rows, the full grid is never stored
+    start, stop: range of flat indices to generate, the whole grid
+    by default
+    """
+    shape = tuple(int(d_j) + 1 for d_j in d)
+    grid_size = 1
+    for n in shape:
+        grid_size *= n
+    if stop is None or stop > grid_size:
+        stop = grid_size
+    chunk_size = int(chunk_size)
+    for chunk_start in range(start, stop, chunk_size):
+        chunk_stop = min(chunk_start + chunk_size, stop)
+        flat_index = np.arange(chunk_start, chunk_stop)
+        yield np.stack(np.unravel_index(flat_index, shape), axis=1)
+
+
+def coarse_to_fine_index_chunks(partition, chunk_size):
+    """
+    the grid indices of grid_index_chunks(partition, chunk_size) on the
+    sub-lattices of halving strides, each without the points of the
+    coarser ones, so that any prefix is spread over the whole grid
+    """
+    partition = np.asarray(partition, dtype=np.int64)
+    coarsest = 2**int(np.log2(np.max(partition)))
+    stride = coarsest
+    while stride >= 1:
+        for index in grid_index_chunks(partition // stride, chunk_size):
+            if stride < coarsest:
+                # points with even indices are on the coarser sub-lattice
+                index = index[np.any(index % 2 == 1, axis=1)]
+            if index.shape[0] > 0:
+                yield index * stride
+        stride //= 2
+
+
+def sample_points_chunks(partition, box, chunk_size, start=0, stop=None):
+    """
+    lazily generate the sample points of a box partitioned into
+    partition[j] pieces in dimension j, in blocks of at most chunk_size
+    start, stop: range of flat grid indices, see grid_index_chunks
+    yield: sample points and the points shifted to I=[0,1]^m
+    """
+    partition = np.asarray(partition, dtype=np.float64)
+    box = np.asarray(box, dtype=np.float64)
+    alpha = box[:, 0]
+    beta = box[:, 1]
+    for index in grid_index_chunks(partition, chunk_size, start, stop):
+        shift_points = index / partition
+        sample_points = (beta - alpha) * shift_points + alpha
+        yield sample_points, shift_points
 
 
 def p2c(py_b):
@@ -466,9 +1135,67 @@ def p2c(py_b):
     return c_b
 
 
-def run(args):
+def add_setting_arguments(parser):
+    """
+    options of write_settings
+    """
+    parser.add_argument('--error_bound', default=1e-3, type=np.float64,
+                        help='Required senstivity of the NNCS')
+    parser.add_argument('--adaptive', action='store_true',
+                        help='Refine the error partition adaptively, far '
+                             'fewer samples on long thin boxes, the bound '
+                             'stays close to the error bound')
+    parser.add_argument('--cache_dir', default=None, type=str,
+                        help='Directory of the approximation cache')
+    parser.add_argument('--cache_tolerance', default=0.0, type=float,
+                        help='Grid the cached boxes are enlarged to')
+    parser.add_argument('--cache_size', default=2**28, type=int,
+                        help='Size limit of the cache in bytes')
+    parser.add_argument('--workers', default=0, type=int,
+                        help='Processes sampling the error, 0 for all cores')
+    parser.add_argument('--profile_trace', default=None, type=str,
+                        help='JSON lines file of the per-step timings, '
+                             'a tagged driver run appends its tag')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Reuse bounds and samples between steps')
+    parser.add_argument('--incremental_tolerance', default=0.1, type=float,
+                        help='Relative enlargement of the reused envelope')
+    parser.add_argument('--lipschitz', default='layer', type=str,
+                        choices=['layer', 'jacobian', 'min'],
+                        help='Bound of the Lipschitz constant')
+    parser.add_argument('--auto_degree', action='store_true',
+                        help='Select the degree bound instead of the '
+                             'driver\'s')
+    parser.add_argument('--degree_target', default=0.01, type=float,
+                        help='Error bound the selected degree has to meet')
+    parser.add_argument('--degree_max', default=3, type=int,
+                        help='Largest degree of a dimension tried')
+
+
+def write_settings(args):
+    """
+    settings read by the approximation in the flow* driver
+    """
     with open('error_bound.py', 'w') as f:
-        f.write('error_bound = ' + str(args.error_bound))
+        f.write('error_bound = ' + str(args.error_bound) + '\n')
+        f.write('adaptive_partition = ' + str(args.adaptive) + '\n')
+        f.write('cache_dir = ' + repr(args.cache_dir) + '\n')
+        f.write('cache_tolerance = ' + str(args.cache_tolerance) + '\n')
+        f.write('cache_size = ' + str(args.cache_size) + '\n')
+        f.write('workers = ' + str(args.workers) + '\n')
+        f.write('profile_trace = ' + repr(args.profile_trace) + '\n')
+        f.write('incremental = ' + str(args.incremental) + '\n')
+        f.write('lipschitz_method = ' + repr(args.lipschitz) + '\n')
+        f.write(
+            'incremental_tolerance = ' + str(args.incremental_tolerance) + '\n'
+        )
+        f.write('auto_degree = ' + str(args.auto_degree) + '\n')
+        f.write('degree_target = ' + str(args.degree_target) + '\n')
+        f.write('degree_max = ' + str(args.degree_max) + '\n')
+
+
+def run(args):
+    write_settings(args)
     cmd = './' + args.filename
     os.system(cmd)
 
@@ -477,7 +1204,6 @@ if __name__ == '__main__':
     parser = argparse.ArgumentParser()
     parser.add_argument('--filename', default='nn_13_sigmoid', type=str,
                         help='File name of the NNCS')
-    parser.add_argument('--error_bound', default=1e-3, type=np.float64,
-                        help='Required senstivity of the NNCS')
+    add_setting_arguments(parser)
     args = parser.parse_args()
     run(args)
@@ -1,3 +1,4 @@
+import os
 import numpy as np
 from neuralnetwork import NN
 
@@ -8,14 +9,42 @@ def nn_controller_details(filename, activation, reuse=False):
     """
     filename = 'nn/' + filename
 
-    with open(filename) as inputfile:
-        lines = inputfile.readlines()
-    length = len(lines)
-    res = np.zeros(length)
-    for i, text in enumerate(lines):
-        res[i] = eval(text)
+    res = load_network_params(filename)
 
     # Set the controller
     NN_controller = NN(res, activation, reuse=reuse)
 
     return NN_controller
+
+
+def load_network_params(filename):
+    """
+    Return all values of the network text file as one vector
+    The values are cached in a binary .npy sidecar that is memory
+    mapped, its first value is the modification time of the text file
+    and it is used while that matches
+    """
+    cache_file = filename + '.npy'
+    mtime = os.path.getmtime(filename)
+    if os.path.exists(cache_file):
+        try:
+            cache = np.load(cache_file, mmap_mode='r')
+            if cache.ndim == 1 and cache.size > 0 and cache[0] == mtime:
+                return cache[1:]
+        except (OSError, ValueError):
+            pass
+
+    # one vectorized pass over the text file
+    res = np.loadtxt(filename, dtype=np.float64, ndmin=1)
+
+    # write to a temporary file first, concurrent runs may load it
+    tmp_file = '{}.{}.tmp'.format(cache_file, os.getpid())
+    try:
+        with open(tmp_file, 'wb') as f:
+            np.save(f, np.concatenate([[mtime], res]))
+        os.replace(tmp_file, cache_file)
+    except OSError:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+
+    return res
@@ -1,9 +1,24 @@
 import numpy as np
-import tensorflow as tf
-import tf_util as U
 from numpy import linalg as LA
 
 
+def relu(x):
+    # in place, x is a fresh layer output
+    return np.maximum(x, 0, out=x)
+
+
+def sigmoid(x):
+    return 1/(1 + np.exp(-x))
+
+
+# batched activation functions by name
+activation_functions = {
+    'ReLU': relu,
+    'tanh': np.tanh,
+    'sigmoid': sigmoid
+}
+
+
 class NN(object):
     """
     a neural network with relu activation function
@@ -14,8 +29,13 @@ class NN(object):
         activation=None,
         keras=False,
         model=None,
-        reuse=False
+        reuse=False,
+        tensorflow=False
     ):
+        """
+        tensorflow: also build the TensorFlow graph of the network,
+        the NumPy engine used by forward and controller needs no TensorFlow
+        """
         if not keras:
             # activation type
             activations = activation.split('_')
@@ -59,18 +79,39 @@ class NN(object):
             # store the weights and bias in two lists
             # self.weights
             # self.bias
-            gpu_devices = U.get_available_gpus()
-            if gpu_devices:
-                device = gpu_devices[0]
-            else:
-                cpu_devices = U.get_available_cpus()
-                device = cpu_devices[0]
-            with tf.device(device):
-                self.parse_w_b()
-                self.x = tf.placeholder(
-                    tf.float64, shape=[None, self.num_of_inputs], name='input'
-                )
-                self.y = self.tensorflow_representation(self.x, reuse=reuse)
+            self.parse_w_b()
+
+            # pre-transposed contiguous parameters of the NumPy engine
+            self.forward_weights = [
+                np.ascontiguousarray(weight.T, dtype=np.float64)
+                for weight in self.weights
+            ]
+            self.forward_bias = [
+                np.ascontiguousarray(bias[:, 0], dtype=np.float64)
+                for bias in self.bias
+            ]
+            self.forward_activations = [
+                activation_functions[act] for act in self.activations
+            ]
+
+            if tensorflow:
+                import tensorflow as tf
+                import tf_util as U
+                gpu_devices = U.get_available_gpus()
+                if gpu_devices:
+                    device = gpu_devices[0]
+                else:
+                    cpu_devices = U.get_available_cpus()
+                    device = cpu_devices[0]
+                with tf.device(device):
+                    self.x = tf.placeholder(
+                        tf.float64,
+                        shape=[None, self.num_of_inputs],
+                        name='input'
+                    )
+                    self.y = self.tensorflow_representation(
+                        self.x, reuse=reuse
+                    )
         else:
             params = []
             self.weights = []
@@ -124,82 +165,55 @@ class NN(object):
         self.weights = [None] * (self.num_of_hidden_layers + 1)
         self.bias = [None] * (self.num_of_hidden_layers + 1)
 
-        # compute parameters of the input layer
-        weight_matrix0 = np.zeros((self.network_structure[0],
-                                   self.num_of_inputs), dtype=np.float64)
-        bias_0 = np.zeros((self.network_structure[0], 1), dtype=np.float64)
-
-        for i in range(self.network_structure[0]):
-            for j in range(self.num_of_inputs):
-                weight_matrix0[i, j] = self.param[self.pointer]
-                self.pointer += 1
-
-            bias_0[i] = self.param[self.pointer]
-            self.pointer += 1
-
-        # store input layer parameters
-        self.weights[0] = weight_matrix0
-        self.bias[0] = bias_0
-
-        # compute the hidden layers paramters
-        for i in range(self.num_of_hidden_layers):
-            weights = np.zeros((self.network_structure[i + 1],
-                                self.network_structure[i]), dtype=np.float64)
-            bias = np.zeros((self.network_structure[i + 1], 1),
-                            dtype=np.float64)
-
-            # read the weight matrix
-            for j in range(self.network_structure[i + 1]):
-                for k in range(self.network_structure[i]):
-                    weights[j][k] = self.param[self.pointer]
-                    self.pointer += 1
-                bias[j] = self.param[self.pointer]
-                self.pointer += 1
+        # each neuron is stored as its weights followed by its bias
+        layer_inputs = [self.num_of_inputs] + list(self.network_structure[:-1])
+        for i in range(self.num_of_hidden_layers + 1):
+            num_in = int(layer_inputs[i])
+            num_out = int(self.network_structure[i])
+            size = num_out * (num_in + 1)
+            layer = np.reshape(
+                np.asarray(
+                    self.param[self.pointer:self.pointer + size],
+                    dtype=np.float64
+                ),
+                (num_out, num_in + 1)
+            )
+            self.pointer += size
 
             # store parameters of each layer
-            self.weights[i + 1] = weights
-            self.bias[i + 1] = bias
+            self.weights[i] = np.array(layer[:, :num_in])
+            self.bias[i] = np.array(layer[:, num_in:])
 
-    def controller(self, x):
+    def forward(self, x):
         """
-        Input: state
-        Output: control value after affine transformation
+        Input: batch of states, one state per row
+        Output: control values after affine transformation,
+        one row per state
         """
-        # transform the input
-        length = x.shape[0]
-        g = x.reshape([length, 1])
-
-        # pass input through each layer
-        for i in range(self.num_of_hidden_layers):
-            # linear transformation
-            g = self.weights[i] @ g
-            g = g + self.bias[i]
-
-            # activation
-            g = self.activate(g)
-
-        # output layer
-        if self.last_layer_activation is not None:
-            # linear transformation
-            g = self.weights[self.num_of_hidden_layers] @ g
-            g = g + self.bias[self.num_of_hidden_layers]
-
-            # activation
-            g = self.last_layer_activate(g)
-        else:
-            # linear transformation
-            g = self.weights[self.num_of_hidden_layers] @ g
-            g = g + self.bias[self.num_of_hidden_layers]
-
-            # activation
-            g = self.activate(g)
+        g = np.ascontiguousarray(x, dtype=np.float64)
+        for weight, bias, activate in zip(
+            self.forward_weights,
+            self.forward_bias,
+            self.forward_activations
+        ):
+            g = g @ weight
+            g += bias
+            g = activate(g)
 
         # affine transformation of output
         y = g - self.offset
-        y = y * self.scale_factor
+        y *= self.scale_factor
 
         return y
 
+    def controller(self, x):
+        """
+        Input: state, or a batch of states with one state per row
+        Output: control value after affine transformation,
+        one column per state
+        """
+        return self.forward(np.reshape(x, (-1, self.num_of_inputs))).T
+
     @property
     def lips(self):
         if self.activation == 'ReLU':
@@ -229,6 +243,7 @@ class NN(object):
         """
         function call to generate the output tensor
         """
+        import tensorflow as tf
         with tf.variable_scope('nn', reuse=tf.AUTO_REUSE):
             for i in range(self.num_of_hidden_layers):
                 # linear transformation
@@ -1,62 +1,49 @@
-import tensorflow as tf
 import numpy as np
-import tf_util as U
 
 
 class polyval(object):
+    """
+    vectorized evaluator of a bernstein polynomial on I=[0,1]^m
+    """
     def __init__(self, orders, d, coeffs, name=None):
-        self.orders = orders
-        self.d = d
-        self.coeffs = coeffs
+        self.orders = np.asarray(orders)
+        self.d = [int(d_j) for d_j in d]
+        self.coeffs = np.asarray(coeffs, dtype=np.float64).flatten()
 
         self.input_dim = self.orders.shape[1]
         self.name = name
 
-        gpu_devices = U.get_available_gpus()
-        if gpu_devices:
-            device = gpu_devices[0]
-        else:
-            cpu_devices = U.get_available_cpus()
-            device = cpu_devices[0]
-
-        with tf.device(device):
-            self.declare_vars()
-
-    def declare_vars(self):
-        self.x = []
-        for idxState in range(self.input_dim):
-            self.x.append(
-                tf.placeholder(
-                    tf.float32, shape=[None, 1], name='input' + str(idxState)
-                )
+        # dense coefficient tensor indexed by the degree combination
+        self.tensor = np.zeros([d_j + 1 for d_j in self.d], dtype=np.float64)
+        np.add.at(self.tensor, tuple(self.orders.T), self.coeffs)
+
+    def basis(self, x, idxState):
+        """
+        bernstein basis y^k * (1-y)^(d-k), k = 0..d, of one dimension
+        for a batch of points, one row per point
+        """
+        d_j = self.d[idxState]
+        k = np.arange(d_j + 1)
+        y = x[:, idxState:idxState + 1]
+        return y**k * (1.0 - y)**(d_j - k)
+
+    def __call__(self, x_in):
+        """
+        evaluate the polynomial on a batch of shifted points
+        time and memory are linear in the batch size
+        """
+        x_in = np.asarray(x_in, dtype=np.float64)
+        # contract the tensor dimension by dimension
+        result = self.basis(x_in, 0) @ self.tensor.reshape(self.d[0] + 1, -1)
+        for idxState in range(1, self.input_dim):
+            result = result.reshape(x_in.shape[0], self.d[idxState] + 1, -1)
+            result = np.einsum(
+                'nkr,nk->nr', result, self.basis(x_in, idxState)
             )
-        self.y = 0.0
-        self.poly()
-
-    def poly(self):
-        for order_item, coeff in zip(self.orders, self.coeffs):
-            item = 1.0
-            for idxState in range(self.input_dim):
-                item *= (
-                    self.x[idxState]**order_item[idxState] *
-                    (1.0 - self.x[idxState])**(
-                        self.d[idxState] - order_item[idxState]
-                    )
-                )
-            self.y = tf.add(self.y, coeff * item)
-
-    def __call__(self, sess, x_in):
-        feed_dict = {}
-        for idxState in range(self.input_dim):
-            feed_dict.update(
-                {self.x[idxState]: x_in[:, idxState].reshape(-1, 1)}
-            )
-        result = sess.run(self.y, feed_dict=feed_dict)
-
-        return result
+        return result.reshape(-1, 1)
 
 
 if __name__ == '__main__':
     poly = polyval(np.array([[1, 2], [1, 2]]), [3, 3], [1, 0.1], 'test')
-    with tf.Session() as sess:
-        result = poly(sess, np.array([[0, 1], [1, 2], [2, 3]]))
+    result = poly(np.array([[0, 1], [0.5, 0.5], [0.2, 0.3]]))
+    print(result)
@@ -0,0 +1,94 @@
+import os
+import json
+import time
+import atexit
+from contextlib import contextmanager
+
+
+class StepProfiler(object):
+    """
+    wall time of the phases of each control step, written as one JSON
+    record per line to the file set by profile_trace in error_bound.py
+    phases: network_load, lipschitz, coefficients, polynomial,
+    error_sampling and reach, measured by the flow* driver
+    the records of a run carry its driver, output tag and network, and
+    a tagged run writes to its own file, e.g. trace_split0.jsonl
+    """
+    def __init__(self):
+        self.step = 0
+        self.record = {}
+        # fields of every record of this interpreter
+        self.labels = {}
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def add(self, name, seconds):
+        """
+        accumulate the time of a phase, a step may run it several times
+        """
+        times = self.record.setdefault('time', {})
+        times[name] = times.get(name, 0.0) + seconds
+
+    def count(self, name, n):
+        self.record[name] = self.record.get(name, 0) + int(n)
+
+    def set(self, name, value):
+        self.record[name] = value
+
+    def label(self, name, value):
+        self.labels[name] = value
+
+    def trace_path(self, trace):
+        """
+        the trace file with the output tag of the run appended
+        """
+        root, ext = os.path.splitext(trace)
+        return root + self.labels.get('tag', '') + ext
+
+    def flush(self):
+        """
+        write the record of the current step and start the next one
+        """
+        if not self.record:
+            return
+        import error_bound
+        trace = getattr(error_bound, 'profile_trace', None)
+        if trace:
+            record = dict(self.labels)
+            record.update(self.record, step=self.step)
+            with open(self.trace_path(trace), 'a') as f:
+                f.write(json.dumps(record, sort_keys=True) + '\n')
+        self.step += 1
+        self.record = {}
+
+
+# profiler of the control steps in this interpreter
+profiler = StepProfiler()
+# a trailing step without reach time is still written
+atexit.register(profiler.flush)
+
+
+def record_run(driver, tag):
+    """
+    called by the flow* driver with its name and output tag before the
+    first control step
+    """
+    profiler.label('driver', os.path.basename(driver))
+    profiler.label('tag', tag)
+    return 0
+
+
+def record_reach(seconds):
+    """
+    called by the flow* driver after the reachability of a control
+    step, closes the record of the step
+    """
+    profiler.add('reach', seconds)
+    profiler.flush()
+    return 0
@@ -0,0 +1,255 @@
+import os
+import re
+import time
+import argparse
+import itertools
+import subprocess
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import error_analysis as ea
+
+
+# first line of the output of a flow* driver, a driver without a
+# specification writes none and its result is Unchecked
+VERDICTS = [
+    ('Yes(', 'Yes'),
+    ('Safe and reachable!', 'Yes'),
+    ('No(', 'No'),
+    ('Hitting the obstacles!', 'No'),
+    ('Unknown', 'Unknown'),
+    ('Reach without safety guarantees.', 'Unknown'),
+]
+
+
+def driver_initial_box(source):
+    """
+    initial box init_x0, init_x1, ... of the state variables in the
+    source of a flow* driver
+    """
+    # commented out initial sets of other experiments
+    source = re.sub(r'//.*', '', source)
+    return [
+        [float(lower), float(upper)]
+        for _, lower, upper in re.findall(
+            r'init_x(\d+)\(\s*([^,]+?)\s*,\s*([^)]+?)\s*\)', source
+        )
+    ]
+
+
+def split_box(box, splits):
+    """
+    grid of splits[j] equal intervals along each dimension j
+    """
+    edges = [
+        np.linspace(lower, upper, n + 1)
+        for (lower, upper), n in zip(box, splits)
+    ]
+    return [
+        np.array([[e[i], e[i + 1]] for e, i in zip(edges, index)])
+        for index in itertools.product(*[range(n) for n in splits])
+    ]
+
+
+def bisect(box, widths):
+    """
+    halves of the box along its widest dimension relative to widths
+    """
+    j = np.argmax((box[:, 1] - box[:, 0]) / widths)
+    middle = (box[j, 0] + box[j, 1]) / 2
+    lower, upper = box.copy(), box.copy()
+    lower[j, 1] = middle
+    upper[j, 0] = middle
+    return [lower, upper]
+
+
+def read_result(path):
+    """
+    verdict, max error and running time written by a flow* driver
+    """
+    result = {'verdict': 'Failed', 'error': None, 'time': 0.0}
+    try:
+        with open(path) as f:
+            output = f.read()
+    except OSError:
+        return result
+    lines = output.splitlines()
+    if not lines:
+        return result
+    result['verdict'] = 'Unchecked'
+    for pattern, verdict in VERDICTS:
+        if pattern in lines[0]:
+            result['verdict'] = verdict
+            break
+    error = re.search(r'Max Error: (\S+)', output)
+    running_time = re.search(r'Running Time: (\S+)', output)
+    if error:
+        result['error'] = float(error.group(1))
+    if running_time:
+        result['time'] = float(running_time.group(1))
+    if result['verdict'] == 'Unchecked' and not error and len(lines) >= 2:
+        # the max error and the running time without labels
+        try:
+            result['error'] = float(lines[0])
+            result['time'] = float(lines[1])
+        except ValueError:
+            pass
+    return result
+
+
+def run_driver(filename, box, tag, timeout=None):
+    """
+    run the flow* driver on the initial box, its outputs are named
+    with the tag appended
+    """
+    output = os.path.join('outputs', filename + tag + '.txt')
+    if os.path.exists(output):
+        os.remove(output)
+    bounds = ','.join(repr(float(v)) for v in box.flatten())
+    try:
+        subprocess.run(
+            ['./' + filename, bounds, tag],
+            stdout=subprocess.DEVNULL, timeout=timeout
+        )
+    except subprocess.TimeoutExpired:
+        pass
+    return read_result(output)
+
+
+def verify(filename, box, splits, max_depth, jobs, timeout=None):
+    """
+    run the driver on the grid of sub-boxes of the initial box in
+    parallel, Unknown sub-boxes are bisected up to max_depth times,
+    Unchecked ones are not since the driver checks no specification,
+    return the result of every final sub-box and the number of runs
+    """
+    box = np.asarray(box, dtype=np.float64)
+    widths = box[:, 1] - box[:, 0]
+    widths[widths <= 0] = 1.0
+    tags = itertools.count()
+    pending = {}
+    leaves = []
+    runs = 0
+    with ThreadPoolExecutor(jobs) as pool:
+
+        def submit(sub_box, depth):
+            tag = '_split{}'.format(next(tags))
+            future = pool.submit(run_driver, filename, sub_box, tag, timeout)
+            pending[future] = (sub_box, depth)
+
+        for sub_box in split_box(box, splits):
+            submit(sub_box, 0)
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                sub_box, depth = pending.pop(future)
+                if future.cancelled():
+                    continue
+                runs += 1
+                result = future.result()
+                result['box'] = sub_box.tolist()
+                result['depth'] = depth
+                print('{} depth {}: {}'.format(
+                    result['verdict'], depth, result['box']
+                ))
+                if result['verdict'] == 'Unknown' and depth < max_depth:
+                    for half in bisect(sub_box, widths):
+                        submit(half, depth + 1)
+                    continue
+                leaves.append(result)
+                if result['verdict'] == 'No':
+                    # one violating sub-box decides the verdict
+                    for other in pending:
+                        other.cancel()
+    return leaves, runs
+
+
+def aggregate(leaves):
+    """
+    the initial set is verified if every sub-box is, and violated if
+    any sub-box is, Unchecked if the driver checks no specification
+    """
+    verdicts = set(leaf['verdict'] for leaf in leaves)
+    if 'No' in verdicts:
+        verdict = 'No'
+    elif verdicts == {'Yes'}:
+        verdict = 'Yes'
+    elif verdicts == {'Unchecked'}:
+        verdict = 'Unchecked'
+    else:
+        verdict = 'Unknown'
+    errors = [leaf['error'] for leaf in leaves if leaf['error'] is not None]
+    return {
+        'verdict': verdict,
+        'max_error': max(errors) if errors else None,
+        'running_time': sum(leaf['time'] for leaf in leaves),
+    }
+
+
+def run(args, parser):
+    jobs = args.jobs or os.cpu_count()
+    # the cores are shared by the drivers running at the same time
+    if not args.workers:
+        args.workers = max(1, os.cpu_count() // jobs)
+    ea.write_settings(args)
+
+    if args.box:
+        bounds = [float(v) for v in args.box.split(',')]
+        box = [bounds[i:i + 2] for i in range(0, len(bounds), 2)]
+    else:
+        with open(os.path.join('systems', args.filename + '.cpp')) as f:
+            box = driver_initial_box(f.read())
+    splits = [int(n) for n in args.splits.split(',')]
+    if len(splits) == 1:
+        splits = splits * len(box)
+    if len(splits) != len(box):
+        parser.error('--splits needs one value or {}'.format(len(box)))
+
+    start = time.perf_counter()
+    leaves, runs = verify(
+        args.filename, box, splits, args.max_depth, jobs,
+        args.timeout or None
+    )
+    summary = aggregate(leaves)
+    wall_time = time.perf_counter() - start
+
+    lines = [
+        'Verification result: ' + summary['verdict'],
+        'Max Error: ' + str(summary['max_error']),
+        'Sub-boxes: {} of {} runs'.format(len(leaves), runs),
+        'Running Time: {} seconds'.format(summary['running_time']),
+        'Wall Time: {} seconds'.format(wall_time),
+    ]
+    lines += [
+        '{} {} {}'.format(leaf['verdict'], leaf['error'], leaf['box'])
+        for leaf in sorted(leaves, key=lambda leaf: leaf['box'])
+    ]
+    print('\n'.join(lines[:5]))
+    with open(os.path.join('outputs', args.filename + '_split.txt'), 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Verify a flow* driver on sub-boxes of its initial '
+                    'set in parallel, run from this directory after '
+                    'make name=<filename>'
+    )
+    parser.add_argument('--filename', default='nn_13_sigmoid', type=str,
+                        help='File name of the NNCS')
+    parser.add_argument('--box', default='', type=str,
+                        help='Comma separated bounds l0,u0,l1,u1,... of the '
+                             'initial set, the driver\'s by default')
+    parser.add_argument('--splits', default='2', type=str,
+                        help='Comma separated intervals per dimension of '
+                             'the initial grid, or one for all')
+    parser.add_argument('--max_depth', default=2, type=int,
+                        help='Bisections of a sub-box with Unknown result')
+    parser.add_argument('--jobs', default=0, type=int,
+                        help='Drivers run at the same time, 0 for all cores')
+    parser.add_argument('--timeout', default=0, type=float,
+                        help='Seconds before a driver run is stopped, '
+                             '0 for none')
+    ea.add_setting_arguments(parser)
+    args = parser.parse_args()
+    run(args, parser)
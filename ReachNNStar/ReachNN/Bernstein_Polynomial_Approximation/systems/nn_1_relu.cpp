@@ -7,7 +7,7 @@ using namespace std;
 using namespace flowstar;
 
 
-int main()
+int main(int argc, char *argv[])
 {
 	// Declaration of the state variables.
 	unsigned int numVars = 3;
@@ -73,6 +73,15 @@ int main()
 
 
 
+	// the initial set can be given on the command line, see split_verification.py
+	vector<double> init_bounds;
+	string output_tag;
+	readInitialSetArguments(argc, argv, init_bounds, output_tag);
+	for (unsigned int i = 0; 2 * i + 1 < init_bounds.size() && i < X0.size(); ++i)
+	{
+		X0[i] = Interval(init_bounds[2 * i], init_bounds[2 * i + 1]);
+	}
+
 	// translate the initial set to a flowpipe
 	Flowpipe initial_set(X0);
 
@@ -93,10 +102,10 @@ int main()
 	char const *neural_network = "nn_1_relu";
 
 	double err_max = 0;
-	time_t start_timer;
-	time_t end_timer;
+	double start_timer;
+	double end_timer;
 	double seconds;
-	time(&start_timer);
+	start_timer = wallClock();
 
 	// perform 35 control steps
 	for (int iter = 0; iter < 35; ++iter)
@@ -124,7 +133,9 @@ int main()
 
 		initial_set.tmvPre.tms[u_id] = tm_u;
 
+		double reach_start = wallClock();
 		dynamics.reach(result, setting, initial_set, unsafeSet);
+		profileReach(wallClock() - reach_start);
 
 		if (result.status == COMPLETED_SAFE || result.status == COMPLETED_UNSAFE || result.status == COMPLETED_UNKNOWN)
 		{
@@ -149,9 +160,9 @@ int main()
 		reach_result = "Verification result: No(35)";
 	}
 
-	time(&end_timer);
+	end_timer = wallClock();
 
-	seconds = difftime(start_timer, end_timer);
+	seconds = end_timer - start_timer;
 
 	// plot the flowpipes in the x-y plane
 	result.transformToTaylorModels(setting);
@@ -167,9 +178,9 @@ int main()
 	}
 
 	std::string err_max_str = "Max Error: " + std::to_string(err_max);
-	std::string running_time = "Running Time: " + std::to_string(-seconds) + " seconds";
+	std::string running_time = "Running Time: " + std::to_string(seconds) + " seconds";
 
-	ofstream result_output("./outputs/nn_1_relu.txt");
+	ofstream result_output("./outputs/nn_1_relu" + output_tag + ".txt");
 	if (result_output.is_open())
 	{
 		result_output << reach_result << endl;
@@ -178,7 +189,7 @@ int main()
 	}
 	// you need to create a subdir named outputs
 	// the file name is example.m and it is put in the subdir outputs
-	plot_setting.plot_2D_interval_GNUPLOT("nn_1_relu", result);
+	plot_setting.plot_2D_interval_GNUPLOT("nn_1_relu" + output_tag, result);
 
 	return 0;
 }
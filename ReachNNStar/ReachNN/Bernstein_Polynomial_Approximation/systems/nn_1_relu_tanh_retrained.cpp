@@ -7,7 +7,7 @@ using namespace std;
 using namespace flowstar;
 
 
-int main()
+int main(int argc, char *argv[])
 {
 	// Declaration of the state variables.
 	unsigned int numVars = 3;
@@ -77,6 +77,15 @@ int main()
 
 
 
+	// the initial set can be given on the command line, see split_verification.py
+	vector<double> init_bounds;
+	string output_tag;
+	readInitialSetArguments(argc, argv, init_bounds, output_tag);
+	for (unsigned int i = 0; 2 * i + 1 < init_bounds.size() && i < X0.size(); ++i)
+	{
+		X0[i] = Interval(init_bounds[2 * i], init_bounds[2 * i + 1]);
+	}
+
 	// translate the initial set to a flowpipe
 	Flowpipe initial_set(X0);
 
@@ -115,12 +124,12 @@ int main()
 	char const *neural_network = "nn_1_relu_tanh_retrained";
 
 	double err_max = 0;
-	time_t start_timer;
-	time_t end_timer;
+	double start_timer;
+	double end_timer;
 	double seconds;
 	string reach_avoid_result;
 	reach_avoid_result = "Unknown";
-	time(&start_timer);
+	start_timer = wallClock();
 
 	// perform 35 control steps
 	for (int iter = 0; iter < 35; ++iter)
@@ -149,7 +158,9 @@ int main()
 
 		initial_set.tmvPre.tms[u_id] = tm_u;
 
+		double reach_start = wallClock();
 		dynamics.reach_while_avoid(result, setting, initial_set, unsafeSet, targetSet);
+		profileReach(wallClock() - reach_start);
 
 		if (result.status == COMPLETED_UNSAFE || result.status == SAFE_REACHABLE || result.status == UNKNOWN_REACHABLE){
 			if (result.status == COMPLETED_UNSAFE){
@@ -187,8 +198,8 @@ int main()
 		reach_avoid_result = "Verification result: No(35)";
 	}
 
-	time(&end_timer);
-	seconds = difftime(start_timer, end_timer);
+	end_timer = wallClock();
+	seconds = end_timer - start_timer;
 
 	// plot the flowpipes in the x-y plane
 	result.transformToTaylorModels(setting);
@@ -204,9 +215,9 @@ int main()
 	}
 
 	std::string err_max_str = "Max Error: " + std::to_string(err_max);
-	std::string running_time = "Running Time: " + std::to_string(-seconds) + " seconds";
+	std::string running_time = "Running Time: " + std::to_string(seconds) + " seconds";
 
-	ofstream result_output("./outputs/nn_1_relu_tanh_retrained.txt");
+	ofstream result_output("./outputs/nn_1_relu_tanh_retrained" + output_tag + ".txt");
 	if (result_output.is_open())
 	{
 		result_output << reach_avoid_result << endl;
@@ -215,7 +226,7 @@ int main()
 	}
 	// you need to create a subdir named outputs
 	// the file name is example.m and it is put in the subdir outputs
-	plot_setting.plot_2D_interval_GNUPLOT("nn_1_relu_tanh_retrained", result);
+	plot_setting.plot_2D_interval_GNUPLOT("nn_1_relu_tanh_retrained" + output_tag, result);
 
 	return 0;
 }
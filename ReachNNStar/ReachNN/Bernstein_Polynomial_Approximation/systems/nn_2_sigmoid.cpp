@@ -7,7 +7,7 @@ using namespace std;
 using namespace flowstar;
 
 
-int main()
+int main(int argc, char *argv[])
 {
 	// Declaration of the state variables.
 	unsigned int numVars = 3;
@@ -74,6 +74,15 @@ int main()
 	X0.push_back(init_x1);
 	X0.push_back(init_u);
 
+	// the initial set can be given on the command line, see split_verification.py
+	vector<double> init_bounds;
+	string output_tag;
+	readInitialSetArguments(argc, argv, init_bounds, output_tag);
+	for (unsigned int i = 0; 2 * i + 1 < init_bounds.size() && i < X0.size(); ++i)
+	{
+		X0[i] = Interval(init_bounds[2 * i], init_bounds[2 * i + 1]);
+	}
+
 	// translate the initial set to a flowpipe
 	Flowpipe initial_set(X0);
 
@@ -94,10 +103,10 @@ int main()
 	char const *neural_network = "nn_2_sigmoid";
 
 	double err_max = 0;
-	time_t start_timer;
-	time_t end_timer;
+	double start_timer;
+	double end_timer;
 	double seconds;
-	time(&start_timer);
+	start_timer = wallClock();
 
 	// perform 9 control steps
 	for (int iter = 0; iter < 9; ++iter)
@@ -125,7 +134,9 @@ int main()
 
 		initial_set.tmvPre.tms[u_id] = tm_u;
 
+		double reach_start = wallClock();
 		dynamics.reach(result, setting, initial_set, unsafeSet);
+		profileReach(wallClock() - reach_start);
 
 		if (result.status == COMPLETED_SAFE || result.status == COMPLETED_UNSAFE || result.status == COMPLETED_UNKNOWN)
 		{
@@ -150,9 +161,9 @@ int main()
 		reach_result = "Verification result: No(9)";
 	}
 
-	time(&end_timer);
+	end_timer = wallClock();
 
-	seconds = difftime(start_timer, end_timer);
+	seconds = end_timer - start_timer;
 
 	// plot the flowpipes in the x-y plane
 	result.transformToTaylorModels(setting);
@@ -168,9 +179,9 @@ int main()
 	}
 
 	std::string err_max_str = "Max Error: " + std::to_string(err_max);
-	std::string running_time = "Running Time: " + std::to_string(-seconds) + " seconds";
+	std::string running_time = "Running Time: " + std::to_string(seconds) + " seconds";
 
-	ofstream result_output("./outputs/nn_2_sigmoid.txt");
+	ofstream result_output("./outputs/nn_2_sigmoid" + output_tag + ".txt");
 	if (result_output.is_open())
 	{
 		result_output << reach_result << endl;
@@ -180,7 +191,7 @@ int main()
 	// you need to create a subdir named outputs
 	// the file name is example.m and it is put in the subdir outputs
 	//plot_setting.plot_2D_interval_GNUPLOT("nn_2_sigmoid", result);
-	plot_setting.plot_2D_octagon_MATLAB("nn_2_sigmoid", result);
+	plot_setting.plot_2D_octagon_MATLAB("nn_2_sigmoid" + output_tag, result);
 
 	return 0;
 }
@@ -7,7 +7,7 @@ using namespace std;
 using namespace flowstar;
 
 
-int main()
+int main(int argc, char *argv[])
 {
 	// Declaration of the state variables.
 	unsigned int numVars = 4;
@@ -78,6 +78,15 @@ int main()
 
 
 
+	// the initial set can be given on the command line, see split_verification.py
+	vector<double> init_bounds;
+	string output_tag;
+	readInitialSetArguments(argc, argv, init_bounds, output_tag);
+	for (unsigned int i = 0; 2 * i + 1 < init_bounds.size() && i < X0.size(); ++i)
+	{
+		X0[i] = Interval(init_bounds[2 * i], init_bounds[2 * i + 1]);
+	}
+
 	// translate the initial set to a flowpipe
 	Flowpipe initial_set(X0);
 
@@ -98,10 +107,10 @@ int main()
 	char const *neural_network = "nn_relu_tanh_1_mixed3_002";
 
 	double err_max = 0;
-	time_t start_timer;
-	time_t end_timer;
+	double start_timer;
+	double end_timer;
 	double seconds;
-	time(&start_timer);
+	start_timer = wallClock();
 
 	// perform 260 control steps
 	for (int iter = 0; iter < 40; ++iter)
@@ -130,7 +139,9 @@ int main()
 
 		initial_set.tmvPre.tms[u_id] = tm_u;
 
+		double reach_start = wallClock();
 		dynamics.reach(result, setting, initial_set, unsafeSet);
+		profileReach(wallClock() - reach_start);
 
 		if (result.status == COMPLETED_SAFE || result.status == COMPLETED_UNSAFE || result.status == COMPLETED_UNKNOWN)
 		{
@@ -142,8 +153,8 @@ int main()
 		}
 	}
 
-	time(&end_timer);
-	seconds = difftime(start_timer, end_timer);
+	end_timer = wallClock();
+	seconds = end_timer - start_timer;
 
 	// plot the flowpipes in the x-y plane
 	result.transformToTaylorModels(setting);
@@ -158,7 +169,7 @@ int main()
 		exit(1);
 	}
 
-	ofstream result_output("./outputs/nn_dubins_car_relu_tanh_1.txt");
+	ofstream result_output("./outputs/nn_dubins_car_relu_tanh_1" + output_tag + ".txt");
 	if (result_output.is_open())
 	{
 		result_output << err_max << endl;
@@ -166,7 +177,7 @@ int main()
 	}
 	// you need to create a subdir named outputs
 	// the file name is example.m and it is put in the subdir outputs
-	plot_setting.plot_2D_interval_GNUPLOT("nn_dubins_car_relu_tanh_1", result);
+	plot_setting.plot_2D_interval_GNUPLOT("nn_dubins_car_relu_tanh_1" + output_tag, result);
 
 	return 0;
 }
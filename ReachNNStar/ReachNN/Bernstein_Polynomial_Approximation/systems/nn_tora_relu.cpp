@@ -1,5 +1,5 @@
 #include "../flowstar/Continuous.h"
-#include "bernstein_poly_approx.h"
+#include "bernstein_taylor_model.h"
 #include<fstream>
 #include<ctime>
 
@@ -7,7 +7,7 @@ using namespace std;
 using namespace flowstar;
 
 
-int main()
+int main(int argc, char *argv[])
 {
 	// Declaration of the state variables.
 	unsigned int numVars = 5;
@@ -83,6 +83,15 @@ int main()
 	X0.push_back(init_u);
 
 
+	// the initial set can be given on the command line, see split_verification.py
+	vector<double> init_bounds;
+	string output_tag;
+	readInitialSetArguments(argc, argv, init_bounds, output_tag);
+	for (unsigned int i = 0; 2 * i + 1 < init_bounds.size() && i < X0.size(); ++i)
+	{
+		X0[i] = Interval(init_bounds[2 * i], init_bounds[2 * i + 1]);
+	}
+
 	// translate the initial set to a flowpipe
 	Flowpipe initial_set(X0);
 
@@ -94,7 +103,7 @@ int main()
 
 	// define the neural network controller
 	char const *module_name = "controller_approximation_lib";
-	char const *function_name1 = "poly_approx_controller";
+	char const *function_name1 = "poly_approx_controller_arrays";
 	char const *function_name2 = "poly_approx_error";
 	char const *function_name3 = "network_lips";
 	char const *degree_bound = "[1, 1, 1, 1]";
@@ -103,10 +112,10 @@ int main()
 	char const *neural_network = "nn_tora_relu";
 	double err_max = 0;
 
-	time_t start_timer;
-	time_t end_timer;
+	double start_timer;
+	double end_timer;
 	double seconds;
-	time(&start_timer);
+	start_timer = wallClock();
 	// perform 10 control steps
 
 	for(int iter=0; iter<10; ++iter)
@@ -116,7 +125,15 @@ int main()
 
 		string strBox = "[" + box[0].toString() + "," + box[1].toString() + "," + box[2].toString() + "," + box[3].toString() + "]";
 
-		string strExpU = bernsteinPolyApproximation(module_name, function_name1, degree_bound, strBox.c_str(), activation, output_index, neural_network);
+		// the polynomial is handed over as arrays instead of an expression string
+		vector<vector<unsigned int> > exponents;
+		vector<double> coefficients;
+		vector<double> normalization;
+		if (!bernsteinPolyApproximationArrays(module_name, function_name1, degree_bound, strBox.c_str(), activation, output_index, neural_network, exponents, coefficients, normalization))
+		{
+			printf("Failed to approximate the controller.\n");
+			exit(1);
+		}
 		double err = stod(bernsteinPolyApproximation(module_name, function_name2, degree_bound, strBox.c_str(), activation, output_index, neural_network));
 
 		if (err >= err_max)
@@ -125,16 +142,16 @@ int main()
 		}
 
 
-		Expression_AST<Real> exp_u(strExpU);
-
 		TaylorModel<Real> tm_u;
-		exp_u.evaluate(tm_u, initial_set.tmvPre.tms, order, initial_set.domain, setting.tm_setting.cutoff_threshold, setting.g_setting);
+		polyApproximationTaylorModel(tm_u, exponents, coefficients, normalization, initial_set.tmvPre.tms, initial_set.domain, order, setting.tm_setting.cutoff_threshold, setting.g_setting);
 
 		tm_u.remainder.bloat(err);
 
 		initial_set.tmvPre.tms[u_id] = tm_u;
 
+		double reach_start = wallClock();
 		dynamics.reach(result, setting, initial_set, unsafeSet);
+		profileReach(wallClock() - reach_start);
 
 		if(result.status == COMPLETED_SAFE || result.status == COMPLETED_UNSAFE || result.status == COMPLETED_UNKNOWN)
 		{
@@ -159,8 +176,8 @@ int main()
 		reach_result = "Verification result: No(10)";
 	}
 
-	time(&end_timer);
-	seconds = difftime(start_timer, end_timer);
+	end_timer = wallClock();
+	seconds = end_timer - start_timer;
 
 	// plot the flowpipes in the x-y plane
 	result.transformToTaylorModels(setting);
@@ -176,9 +193,9 @@ int main()
 	}
 
 	std::string err_max_str = "Max Error: " + std::to_string(err_max);
-	std::string running_time = "Running Time: " + std::to_string(-seconds) + " seconds";
+	std::string running_time = "Running Time: " + std::to_string(seconds) + " seconds";
 
-	ofstream result_output("./outputs/nn_tora_relu.txt");
+	ofstream result_output("./outputs/nn_tora_relu" + output_tag + ".txt");
 	if (result_output.is_open())
 	{
 		result_output << reach_result << endl;
@@ -188,7 +205,7 @@ int main()
 
 	// you need to create a subdir named outputs
 	// the file name is example.m and it is put in the subdir outputs
-	plot_setting.plot_2D_interval_GNUPLOT("nn_tora_relu", result);
+	plot_setting.plot_2D_interval_GNUPLOT("nn_tora_relu" + output_tag, result);
 
 	return 0;
 }
@@ -7,7 +7,7 @@ using namespace std;
 using namespace flowstar;
 
 
-int main()
+int main(int argc, char *argv[])
 {
 	// Declaration of the state variables.
 	unsigned int numVars = 5;
@@ -83,6 +83,15 @@ setting.printOff();
 	X0.push_back(init_u);
 
 
+	// the initial set can be given on the command line, see split_verification.py
+	vector<double> init_bounds;
+	string output_tag;
+	readInitialSetArguments(argc, argv, init_bounds, output_tag);
+	for (unsigned int i = 0; 2 * i + 1 < init_bounds.size() && i < X0.size(); ++i)
+	{
+		X0[i] = Interval(init_bounds[2 * i], init_bounds[2 * i + 1]);
+	}
+
 	// translate the initial set to a flowpipe
 	Flowpipe initial_set(X0);
 
@@ -108,10 +117,10 @@ setting.printOff();
 //
     double err_max = 0;
 
-    time_t start_timer;
-    time_t end_timer;
+    double start_timer;
+    double end_timer;
     double seconds;
-    time(&start_timer);
+    start_timer = wallClock();
 	// perform 25 control steps
 
 	for(int iter=0; iter<10; ++iter)
@@ -185,7 +194,9 @@ tmvTemp.tms[u_id].intEval(range_of_flowpipe, initial_set.domain);
 cout << range_of_flowpipe << "\n";
 */
 
+		double reach_start = wallClock();
 		dynamics.reach(result, setting, initial_set, unsafeSet);
+		profileReach(wallClock() - reach_start);
 
 
 		if(result.status == COMPLETED_SAFE || result.status == COMPLETED_UNSAFE || result.status == COMPLETED_UNKNOWN)
@@ -197,8 +208,8 @@ cout << range_of_flowpipe << "\n";
 			printf("Terminated due to too large overestimation.\n");
 		}
 	}
-    time(&end_timer);
-    seconds = difftime(start_timer, end_timer);
+    end_timer = wallClock();
+    seconds = end_timer - start_timer;
 
 	// plot the flowpipes in the x-y plane
 	result.transformToTaylorModels(setting);
@@ -213,7 +224,7 @@ cout << range_of_flowpipe << "\n";
 		exit(1);
 	}
 
-	ofstream result_output("./outputs/nn_tora_relu_sigmoid.txt");
+	ofstream result_output("./outputs/nn_tora_relu_sigmoid" + output_tag + ".txt");
 	if (result_output.is_open())
 	{
 		result_output << err_max << endl;
@@ -222,7 +233,7 @@ cout << range_of_flowpipe << "\n";
 
 	// you need to create a subdir named outputs
 	// the file name is example.m and it is put in the subdir outputs
-	plot_setting.plot_2D_interval_MATLAB("nn_tora_relu_sigmoid", result);
+	plot_setting.plot_2D_interval_MATLAB("nn_tora_relu_sigmoid" + output_tag, result);
 
 	return 0;
 }
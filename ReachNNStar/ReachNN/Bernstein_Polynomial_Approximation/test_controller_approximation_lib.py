@@ -0,0 +1,95 @@
+import numpy as np
+import pytest
+import sympy as sp
+
+import controller_approximation_lib as cal
+from conftest import random_network
+
+
+@pytest.fixture
+def approximator(settings, monkeypatch):
+    monkeypatch.setattr(settings, 'cache_dir', None, raising=False)
+    monkeypatch.setattr(
+        cal, 'nn_controller_details',
+        lambda neural_network, activation: random_network(
+            2, [8, 8], 1, activation
+        )
+    )
+
+    def make(degree_target, degree_max):
+        monkeypatch.setattr(
+            settings, 'degree_target', degree_target, raising=False
+        )
+        monkeypatch.setattr(settings, 'degree_max', degree_max, raising=False)
+        return cal.ControllerApproximator('test', 'sigmoid')
+    return make
+
+
+def test_degree_target_below_error_bound_is_rejected(approximator):
+    approximator = approximator(degree_target=5e-3, degree_max=2)
+    with pytest.raises(ValueError, match='degree_target'):
+        approximator.degree_bound('auto', [[0.0, 0.4], [-0.2, 0.1]], [0])
+
+
+def test_unmet_target_takes_the_smallest_full_bound(approximator):
+    approximator = approximator(degree_target=1.05e-2, degree_max=2)
+    box = [[-2.0, 2.0], [-2.0, 2.0]]
+    d = approximator.degree_bound('auto', box, [0])
+    # full bounds of every candidate, without the ceiling
+    errors = {
+        (d_0, d_1): float(approximator.compute([d_0, d_1], box, [0])[1][0])
+        for d_0 in [1, 2] for d_1 in [1, 2]
+    }
+    assert min(errors.values()) > 1.05e-2
+    assert errors[tuple(d)] == min(errors.values())
+    _, error_bound = approximator.approximate(d, box, 0)
+    assert float(error_bound) == errors[tuple(d)]
+
+
+def test_cache_key_covers_the_error_settings(settings, monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, 'cache_dir', str(tmp_path), raising=False)
+    monkeypatch.setattr(
+        cal, 'nn_controller_details',
+        lambda neural_network, activation: random_network(
+            2, [8, 8], 1, activation
+        )
+    )
+    keys = set()
+    for method, incremental in [
+        ('layer', False), ('jacobian', False), ('layer', True)
+    ]:
+        settings.lipschitz_method = method
+        settings.incremental = incremental
+        approximator = cal.ControllerApproximator('test', 'sigmoid')
+        keys.add(approximator.cache.key(
+            approximator.network_hash, [1, 1], [[0, 1], [0, 1]], 0,
+            approximator.error_bound, approximator.settings
+        ))
+    assert len(keys) == 3
+
+
+def test_arrays_describe_the_expression(settings, monkeypatch):
+    monkeypatch.setattr(settings, 'cache_dir', None, raising=False)
+    monkeypatch.setattr(settings, 'auto_degree', False, raising=False)
+    monkeypatch.setattr(cal, 'approximators', {})
+    monkeypatch.setattr(
+        cal, 'nn_controller_details',
+        lambda neural_network, activation: random_network(
+            2, [8, 8], 1, activation
+        )
+    )
+    box_str = '[[0.1, 0.3], [-1.0, -0.6]]'
+    args = ('[2, 3]', box_str, '0', 'ReLU', 'test')
+    exponents, coefficients, box = cal.poly_approx_controller_arrays(*args)
+    expression = sp.sympify(
+        cal.poly_approx_controller(*args).replace('^', '**')
+    )
+    assert exponents.dtype == np.int32 and exponents.flags.c_contiguous
+    assert box.tolist() == [[0.1, 0.3], [-1.0, -0.6]]
+    x = sp.symbols('x:2')
+    for point in [(0.1, -1.0), (0.25, -0.7)]:
+        y = (np.array(point) - box[:, 0]) / (box[:, 1] - box[:, 0])
+        value = np.sum(coefficients * np.prod(y**exponents, axis=1))
+        assert value == pytest.approx(
+            float(expression.subs(dict(zip(x, point)))), abs=1e-12
+        )
@@ -0,0 +1,161 @@
+from fractions import Fraction
+
+import numpy as np
+from numpy import linalg as LA
+import pytest
+import sympy as sp
+
+import error_analysis as ea
+from conftest import random_network
+
+
+def sampled_error(nn, d, box, output_index, num=200):
+    """
+    max error of the polynomial on a dense grid of the box
+    """
+    _, coeffs = ea.nn_poly_approx_bernstein_cuda(
+        nn.controller, d, box, [output_index]
+    )
+    poly = ea.polyval(
+        ea.degree_comb_lists(d, len(d)), d, coeffs[0], 'test'
+    )
+    box = np.asarray(box)
+    shift_points = np.stack(np.meshgrid(
+        *[np.linspace(0, 1, num)] * len(d)
+    ), axis=-1).reshape(-1, len(d))
+    sample_points = box[:, 0] + (box[:, 1] - box[:, 0]) * shift_points
+    return np.max(np.abs(
+        poly(shift_points)[:, 0] - nn.forward(sample_points)[:, output_index]
+    ))
+
+
+@pytest.mark.parametrize('d, box', [
+    ([2, 3], [[-0.5, 0.5], [0.2, 0.4]]),
+    ([3, 1], [[0.1, 0.3], [-1.0, -0.6]]),
+    ([4, 4], [[0.795, 0.805], [0.49, 0.51]]),
+])
+def test_flowstar_expression_matches_sympy_polynomial(d, box):
+    nn = random_network(2, [8, 8], 1, 'tanh')
+    x = sp.symbols('x:2')
+    expected, _, _ = ea.nn_poly_approx_bernstein(
+        nn.controller, x, d, box, 0
+    )
+    _, coeffs = ea.nn_poly_approx_bernstein_cuda(nn.controller, d, box, [0])
+    expression = ea.monomial_to_flowstar(
+        ea.bernstein_to_monomial(coeffs[0], d), box
+    )
+    actual = sp.sympify(expression.replace('^', '**'))
+    points = np.random.RandomState(0).uniform(
+        np.asarray(box)[:, 0], np.asarray(box)[:, 1], (20, 2)
+    )
+    for point in points:
+        values = dict(zip(x, point))
+        assert float(actual.subs(values)) == pytest.approx(
+            float(expected.subs(values)), abs=1e-9
+        )
+
+
+def test_conversion_error_bounds_the_monomial_rounding():
+    nn = random_network(2, [8, 8], 1, 'tanh')
+    d = [5, 5]
+    box = [[0.7975, 0.8025], [0.4975, 0.5025]]
+    _, coeffs = ea.nn_poly_approx_bernstein_cuda(nn.controller, d, box, [0])
+    monomials = ea.bernstein_to_monomial(coeffs[0], d)
+    bernstein = np.reshape(coeffs[0], [6, 6])
+    bound = ea.bernstein_conversion_error(coeffs[0], d)
+    for y in [(0, 0), (1, 1), (Fraction(1, 3), Fraction(5, 7))]:
+        # exact evaluation of both forms of the float coefficients
+        exact = sum(
+            Fraction(bernstein[k]) *
+            y[0]**k[0] * (1 - y[0])**(5 - k[0]) *
+            y[1]**k[1] * (1 - y[1])**(5 - k[1])
+            for k in np.ndindex(6, 6)
+        )
+        rounded = sum(
+            Fraction(monomials[i]) * y[0]**i[0] * y[1]**i[1]
+            for i in np.ndindex(6, 6)
+        )
+        assert abs(float(rounded - exact)) <= bound
+    # far below the default error_bound of 1e-3
+    assert bound < 1e-6
+
+
+@pytest.mark.parametrize('activation', ['ReLU', 'sigmoid'])
+def test_incremental_matches_uniform_on_anisotropic_box(
+    settings, activation, capsys
+):
+    nn = random_network(2, [8, 8], 1, activation)
+    d = [2, 2]
+    boxes = [
+        [[0.8, 0.9], [0.5, 0.505]],
+        [[0.805, 0.9], [0.5003, 0.5048]],
+    ]
+    for box in boxes:
+        settings.incremental = False
+        uniform = ea.bernstein_error_partition_cuda(
+            nn, nn.controller, d, box, 0, activation, 'test'
+        )
+        settings.incremental = True
+        incremental = ea.bernstein_error_partition_cuda(
+            nn, nn.controller, d, box, 0, activation, 'test'
+        )
+        assert incremental >= sampled_error(nn, d, box, 0)
+        assert incremental <= 1.5 * uniform
+    # the second box is sampled on the lattice of the first envelope
+    assert 'reuse the envelope' in capsys.readouterr().out
+
+
+def test_derivative_range_of_unsupported_activation():
+    with pytest.raises(ValueError, match='softplus'):
+        ea.activation_derivative_range(
+            np.zeros(2), np.ones(2), 'softplus'
+        )
+
+
+@pytest.mark.parametrize('activation', ['ReLU', 'sigmoid', 'tanh'])
+def test_jacobian_lipschitz_bounds_finite_differences(activation):
+    nn = random_network(3, [16, 8], 2, activation, seed=5)
+    box = np.array([[0.3, 0.4], [-0.2, -0.1], [0.5, 0.55]])
+    rng = np.random.RandomState(3)
+    points = rng.uniform(box[:, 0], box[:, 1], (20000, 3))
+    steps = rng.normal(size=points.shape) * 1e-6
+    for output_index in [0, 1]:
+        lips = ea.lipschitz_jacobian(nn, box, output_index)
+        slopes = np.abs(
+            nn.forward(points + steps)[:, output_index] -
+            nn.forward(points)[:, output_index]
+        ) / LA.norm(steps, axis=1)
+        assert lips >= np.max(slopes) * (1 - 1e-4)
+
+
+def test_in_process_sampling_keeps_the_whole_memory_budget(
+    settings, monkeypatch
+):
+    nn = random_network(2, [8, 8], 1, 'ReLU')
+    settings.workers = 4
+    batch_size = ea.sample_batch_size
+    calls = []
+
+    def record(nn, degree_bound, workers=1):
+        calls.append(workers)
+        return batch_size(nn, degree_bound, workers)
+    monkeypatch.setattr(ea, 'sample_batch_size', record)
+    # a grid smaller than a shard is sampled in this process
+    ea.bernstein_error_partition_cuda(
+        nn, nn.controller, [1, 1], [[0.0, 0.1], [0.0, 0.1]], 0, 'ReLU', 'test'
+    )
+    assert calls == [1]
+
+
+def test_adaptive_mode_skips_the_uniform_partition(settings, monkeypatch):
+    nn = random_network(2, [8, 8], 1, 'sigmoid')
+    box = [[0.0, 0.4], [-0.2, 0.1]]
+    settings.adaptive_partition = True
+
+    def uniform(*args, **kwargs):
+        raise AssertionError('uniform Lipschitz constant computed')
+    monkeypatch.setattr(ea, 'lipschitz_outputs', uniform)
+    error = ea.bernstein_error_partition_cuda(
+        nn, nn.controller, [2, 2], box, 0, 'sigmoid', 'test'
+    )
+    assert error >= sampled_error(nn, [2, 2], box, 0)
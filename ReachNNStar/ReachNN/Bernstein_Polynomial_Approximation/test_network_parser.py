@@ -0,0 +1,22 @@
+import os
+
+import numpy as np
+
+from network_parser import load_network_params
+
+
+def test_sidecar_is_memory_mapped_and_follows_the_text_file(tmp_path):
+    filename = str(tmp_path / 'nn_test')
+    values = [2.0, 1.0, 1.0, 3.0] + [i / 7.0 for i in range(13)] + [0.0, 1.0]
+    with open(filename, 'w') as f:
+        f.write('\n'.join(repr(v) for v in values) + '\n')
+    assert np.array_equal(load_network_params(filename), values)
+    cached = load_network_params(filename)
+    assert isinstance(cached, np.memmap)
+    assert np.array_equal(cached, values)
+
+    values[-1] = 2.0
+    with open(filename, 'w') as f:
+        f.write('\n'.join(repr(v) for v in values) + '\n')
+    os.utime(filename, (0, 1))
+    assert load_network_params(filename)[-1] == 2.0
@@ -0,0 +1,23 @@
+import json
+
+import profiler as pf
+
+
+def test_tagged_runs_write_labelled_records(settings, tmp_path, monkeypatch):
+    trace = tmp_path / 'trace.jsonl'
+    monkeypatch.setattr(settings, 'profile_trace', str(trace), raising=False)
+    for tag in ['_split0', '_split1']:
+        step_profiler = pf.StepProfiler()
+        monkeypatch.setattr(pf, 'profiler', step_profiler)
+        pf.record_run('./nn_1_relu', tag)
+        step_profiler.label('network', 'nn_1_relu')
+        step_profiler.add('lipschitz', 0.5)
+        pf.record_reach(1.0)
+    assert not trace.exists()
+    for tag in ['_split0', '_split1']:
+        with open(str(tmp_path / ('trace' + tag + '.jsonl'))) as f:
+            records = [json.loads(line) for line in f]
+        assert records == [{
+            'driver': 'nn_1_relu', 'tag': tag, 'network': 'nn_1_relu',
+            'step': 0, 'time': {'lipschitz': 0.5, 'reach': 1.0},
+        }]
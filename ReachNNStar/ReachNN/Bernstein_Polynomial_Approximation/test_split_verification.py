@@ -0,0 +1,34 @@
+import pytest
+
+import split_verification as sv
+
+
+@pytest.mark.parametrize('output, verdict, error, running_time', [
+    ('Verification result: Yes(35)\nMax Error: 0.01\n'
+     'Running Time: 2.5 seconds\n', 'Yes', 0.01, 2.5),
+    ('Verification result: Unknown(35)\nMax Error: 0.02\n'
+     'Running Time: 3.0 seconds\n', 'Unknown', 0.02, 3.0),
+    ('Reach without safety guarantees.\nMax Error: 0.03\n'
+     'Running Time: 4.0 seconds\n', 'Unknown', 0.03, 4.0),
+    # drivers without a specification, e.g. nn_dubins_car_relu_tanh_1
+    ('0.04\n5.0\n', 'Unchecked', 0.04, 5.0),
+])
+def test_read_result(tmp_path, output, verdict, error, running_time):
+    path = tmp_path / 'result.txt'
+    path.write_text(output)
+    result = sv.read_result(str(path))
+    assert result['verdict'] == verdict
+    assert result['error'] == error
+    assert result['time'] == running_time
+
+
+def test_unchecked_sub_boxes_are_not_bisected(monkeypatch):
+    monkeypatch.setattr(
+        sv, 'run_driver',
+        lambda filename, box, tag, timeout=None: {
+            'verdict': 'Unchecked', 'error': 0.01, 'time': 1.0
+        }
+    )
+    leaves, runs = sv.verify('test', [[0, 1], [0, 1]], [2, 2], 2, 2)
+    assert runs == 4
+    assert sv.aggregate(leaves)['verdict'] == 'Unchecked'
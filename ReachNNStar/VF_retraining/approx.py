@@ -7,6 +7,7 @@ import ast
 from uat import univAprox
 from network import nn_config
 from SA import simulated_annealing
+from sampler import batch_sampler
 import baselines.common.tf_util as U
 from baselines.common.mpi_adam import MpiAdam
 from mpi4py import MPI
@@ -53,6 +54,14 @@ if __name__ == '__main__':
                         help='Bound of regression error')
     parser.add_argument('--multi_range', default=None, type=str,
                         help='input range if multi-dim need to be specified')
+    parser.add_argument('--power_iterations', default=1, type=int,
+                        help='Power iteration steps of the spectral norms per iteration')
+    parser.add_argument('--batch_size', default=100000, type=int,
+                        help='Samples per iteration')
+    parser.add_argument('--prefetch', default=2, type=int,
+                        help='Batches sampled ahead of the training step')
+    parser.add_argument('--sample_pool', default=0, type=int,
+                        help='Size of a fixed pool of samples reshuffled on every pass, 0 for fresh samples')
     args = parser.parse_args()
 
     stepsize = args.stepsize
@@ -73,7 +82,8 @@ if __name__ == '__main__':
             # define approximator
             ua = univAprox(args.input_dim, args.output_dim,
                            args.hidden_dim, args.layers, args.activation,
-                           scalar=args.ua_scalar, offset=args.ua_offset)
+                           scalar=args.ua_scalar, offset=args.ua_offset,
+                           power_iterations=args.power_iterations)
             y = args.ua_scalar * (ua(x) - args.ua_offset)
 
             # define the resulting loss and graph it using tensorboard
@@ -93,11 +103,15 @@ if __name__ == '__main__':
             with tf.variable_scope('Lossandgrads'):
                 # losses
                 regret_loss = tf.reduce_mean(tf.square(y - y_true))
-                vf_loss = tf.square(scalar * ua.lipschitz_constant - args.Lipschitz)
+                vf_loss = tf.square(scalar * ua.lipschitz_estimate - args.Lipschitz)
 
-                # gradients
-                regret_lossandgrad = U.function([x], [regret_loss, U.flatgrad(regret_loss, trainable_vars)])
-                vf_lossandgrad = U.function([x], [vf_loss, U.flatgrad(vf_loss, trainable_vars)])
+                # both losses and gradients from one run of the graph
+                lossandgrads = U.function([x], [regret_loss, vf_loss,
+                                                U.flatgrad(regret_loss, trainable_vars),
+                                                U.flatgrad(vf_loss, trainable_vars)])
+
+            # exact value, only evaluated for reporting
+            lipschitz_constant = scalar * ua.lipschitz_constant
 
             # define our train operation using Adam optimizer
             adam_all = MpiAdam(trainable_vars, epsilon=1e-3)
@@ -125,26 +139,26 @@ if __name__ == '__main__':
         max_it = args.max_it
         eps = args.regression_bound
         sa_eps = simulated_annealing(T0=1)
+        comm = MPI.COMM_WORLD
+        # sample input from range in a background thread
+        samples = batch_sampler(input_range, args.input_dim, args.batch_size,
+                                args.prefetch, args.sample_pool)
         while iters < max_it or current_loss > args.regression_bound:
-            # sampel input from range
-            x_in = np.random.uniform(-input_range, input_range, [100000, args.input_dim])
+            x_in = next(samples)
             # and train on it
-            current_loss, g_regret = regret_lossandgrad(x_in)
-            current_vf_loss, g_vf = vf_lossandgrad(x_in)
+            current_loss, current_vf_loss, g_regret, g_vf = lossandgrads(x_in)
 
             nn_g = g_regret[0:trainable_var_count]
             nn_g_vf = g_vf[0:trainable_var_count]
 
-            comm = MPI.COMM_WORLD
-
-            nn_g_reduced = np.zeros_like(nn_g)
-            nn_g_vf_reduced = np.zeros_like(nn_g_vf)
-
-            comm.Allreduce(nn_g, nn_g_reduced, op=MPI.SUM)
-            nn_g_reduced /= comm.Get_size()
+            # reduce both gradients in one buffer
+            nn_g_all = np.concatenate((nn_g, nn_g_vf))
+            nn_g_all_reduced = np.zeros_like(nn_g_all)
+            comm.Allreduce(nn_g_all, nn_g_all_reduced, op=MPI.SUM)
+            nn_g_all_reduced /= comm.Get_size()
 
-            comm.Allreduce(nn_g_vf, nn_g_vf_reduced, op=MPI.SUM)
-            nn_g_vf_reduced /= comm.Get_size()
+            nn_g_reduced = nn_g_all_reduced[0:trainable_var_count]
+            nn_g_vf_reduced = nn_g_all_reduced[trainable_var_count::]
 
             final_gradient = np.zeros(len(g_regret)+len(g_vf) - trainable_var_count)
             final_gradient[trainable_var_count::] = np.concatenate((g_regret[trainable_var_count::],
@@ -197,9 +211,10 @@ if __name__ == '__main__':
                 adam_all.update(final_gradient, stepsize)
 
             if (iters + 1) % 100 == 0:
-                L = sess.run(scalar*ua.lipschitz_constant)
+                L = sess.run(lipschitz_constant)
                 print('batch: {}, regret_loss: {}, reduce_lipschitz numbers: {}, Lipschitz: {}'.format(iters + 1, current_loss, same_dir_cnt, L))
             iters += 1
+        samples.close()
 
         # Finally we save the graph to check that it looks like what we wanted
         saver.save(sess, result_folder + '/data.chkp')
@@ -212,8 +227,9 @@ if __name__ == '__main__':
         ua.store_params(weights, bias, args.output_file)
 
         # compute lipschitz constant
-        L = sess.run(scalar*ua.lipschitz_constant)
+        L = sess.run(lipschitz_constant)
         print('Lipschitz constant: {}'.format(L))
+        print('Regression loss: {}'.format(current_loss))
 
         # test values
         # x_test = np.array([[0, 0.01], [0.8629, 0.8812]])
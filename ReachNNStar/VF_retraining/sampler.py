@@ -0,0 +1,81 @@
+import queue
+import threading
+import numpy as np
+
+
+class batch_sampler(object):
+    """
+    uniform samples of the input range in float32 batches, drawn by a
+    background thread into a bounded queue so that the sampling overlaps
+    the training step
+    pool_size: the batches are taken from a fixed pool of that many
+    samples, reshuffled on every pass, instead of fresh samples
+    """
+    def __init__(self, input_range, input_dim, batch_size=100000, prefetch=2,
+                 pool_size=0, seed=None):
+        self.high = np.asarray(input_range, dtype=np.float64)
+        self.input_dim = input_dim
+        self.batch_size = batch_size
+        self.pool_size = pool_size
+        if pool_size and pool_size < batch_size:
+            raise ValueError('pool of {} samples is smaller than a batch of {}'.format(pool_size, batch_size))
+        # the thread has its own generator, np.random is left to the caller
+        self.rng = np.random.RandomState(seed)
+
+        self.queue = queue.Queue(maxsize=prefetch)
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.fill, daemon=True)
+        self.thread.start()
+
+    def uniform(self, size):
+        return self.rng.uniform(-self.high, self.high, [size, self.input_dim]).astype(np.float32)
+
+    def batches(self):
+        """
+        generate the batches drawn by the thread
+        """
+        if not self.pool_size:
+            while True:
+                yield self.uniform(self.batch_size)
+        pool = self.uniform(self.pool_size)
+        while True:
+            order = self.rng.permutation(self.pool_size)
+            for start in range(0, self.pool_size - self.batch_size + 1, self.batch_size):
+                yield pool[order[start:start + self.batch_size]]
+
+    def fill(self):
+        try:
+            for batch in self.batches():
+                while not self.stopped.is_set():
+                    try:
+                        self.queue.put(batch, timeout=0.1)
+                        break
+                    except queue.Full:
+                        pass
+                if self.stopped.is_set():
+                    return
+        except Exception as error:
+            # raised again by the next call of next()
+            self.queue.put(error)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        batch = self.queue.get()
+        if isinstance(batch, Exception):
+            raise batch
+        return batch
+
+    def close(self):
+        """
+        stop the thread, batches still in the queue are dropped
+        """
+        self.stopped.set()
+        # a thread blocked on the full queue can finish
+        while True:
+            try:
+                self.queue.get_nowait()
+            except queue.Empty:
+                break
+        self.thread.join()
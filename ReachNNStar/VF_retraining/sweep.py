@@ -0,0 +1,183 @@
+import os
+import re
+import csv
+import sys
+import time
+import shutil
+import argparse
+import itertools
+import subprocess
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+dir = os.path.dirname(os.path.realpath(__file__))
+
+# environment variables limiting the threads of TF, OpenMP and BLAS
+THREAD_LIMITS = ['RCALL_NUM_CPU', 'OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS']
+
+COLUMNS = ['network', 'Lipschitz_target', 'hidden_dim', 'layers', 'regression_loss', 'Lipschitz', 'seconds', 'status']
+
+
+def read_result(output):
+    """
+    final regression loss and Lipschitz constant printed by approx.py
+    """
+    result = {}
+    loss = re.search(r'Regression loss: (\S+)', output)
+    if loss:
+        result['regression_loss'] = float(loss.group(1))
+    lipschitz = re.search(r'Lipschitz constant: (\S+)', output)
+    if lipschitz:
+        result['Lipschitz'] = float(lipschitz.group(1))
+    return result
+
+
+def run_job(job, args, threads):
+    """
+    train one configuration with approx.py, its output is kept in
+    results/sweep/<output_file>.log
+    """
+    network, target, hidden_dim, layers = job
+    output_file = '{}_retrained_L{}_h{}_l{}'.format(network, target, hidden_dim, layers)
+    command = [sys.executable, 'approx.py',
+               '--filename', network,
+               '--output_file', output_file,
+               '--original_activation', args.original_activation or args.activation,
+               '--activation', args.activation,
+               '--input_dim', str(args.input_dim),
+               '--output_dim', str(args.output_dim),
+               '--hidden_dim', str(hidden_dim),
+               '--layers', str(layers),
+               '--Lipschitz', str(target),
+               '--range', str(args.range),
+               '--scalar', str(args.scalar),
+               '--ua_scalar', str(args.scalar),
+               '--offset', str(args.offset),
+               '--ua_offset', str(args.offset),
+               '--stepsize', str(args.stepsize),
+               '--max_it', str(args.max_it),
+               '--regression_bound', str(args.regression_bound)]
+    if args.multi_range is not None:
+        command += ['--multi_range', args.multi_range]
+    env = dict(os.environ)
+    for name in THREAD_LIMITS:
+        env[name] = str(threads)
+
+    row = {'network': network, 'Lipschitz_target': target, 'hidden_dim': hidden_dim, 'layers': layers,
+           'output_file': output_file, 'status': 'ok'}
+    start = time.time()
+    try:
+        process = subprocess.run(command, cwd=dir, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                 universal_newlines=True, timeout=args.timeout or None)
+        output = process.stdout
+        if process.returncode != 0:
+            row['status'] = 'failed'
+    except subprocess.TimeoutExpired as error:
+        output = error.stdout or ''
+        if isinstance(output, bytes):
+            output = output.decode(errors='replace')
+        row['status'] = 'timeout'
+    row['seconds'] = time.time() - start
+    row.update(read_result(output))
+    if 'regression_loss' not in row and row['status'] == 'ok':
+        row['status'] = 'failed'
+    with open(os.path.join(dir, 'results', 'sweep', output_file + '.log'), 'w') as log:
+        log.write(output)
+    return row
+
+
+def select(rows, regression_bound):
+    """
+    configuration of the smallest Lipschitz constant whose regression
+    loss meets the bound, None if there is none
+    """
+    feasible = [row for row in rows if row['status'] == 'ok' and row['regression_loss'] <= regression_bound]
+    if not feasible:
+        return None
+    return min(feasible, key=lambda row: row['Lipschitz'])
+
+
+def format_table(rows, columns):
+    """
+    rows aligned in columns as plain text
+    """
+    cells = [columns] + [['{:.4g}'.format(row[c]) if isinstance(row.get(c), float) else str(row.get(c, ''))
+                          for c in columns] for row in rows]
+    widths = [max(len(line[j]) for line in cells) for j in range(len(columns))]
+    return '\n'.join('  '.join(cell.ljust(width) for cell, width in zip(line, widths)).rstrip() for line in cells)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Train approx.py on every combination of the networks, '
+                                                 'Lipschitz targets, hidden dims and layers in parallel')
+    parser.add_argument('--filename', default='nn_1_tanh', type=str,
+                        help='Comma separated network parameters in nn/')
+    parser.add_argument('--Lipschitz', default='0', type=str,
+                        help='Comma separated target Lipschiz constant values')
+    parser.add_argument('--hidden_dim', default='20', type=str,
+                        help='Comma separated numbers of neurons')
+    parser.add_argument('--layers', default='2', type=str,
+                        help='Comma separated numbers of layers')
+    parser.add_argument('--original_activation', default=None, type=str,
+                        help='Activation function for original network, the retrained one by default')
+    parser.add_argument('--activation', default='TANH', type=str,
+                        help='Activation function for retrained network')
+    parser.add_argument('--input_dim', default=2, type=int,
+                        help='Dimension of input')
+    parser.add_argument('--output_dim', default=1, type=int,
+                        help='Dimension of output')
+    parser.add_argument('--range', default=1.5, type=float,
+                        help='Input Range')
+    parser.add_argument('--multi_range', default=None, type=str,
+                        help='input range if multi-dim need to be specified')
+    parser.add_argument('--scalar', default=1.0, type=float,
+                        help='Scale factor of the nn and ua output')
+    parser.add_argument('--offset', default=0.0, type=float,
+                        help='Offset of the nn and ua output')
+    parser.add_argument('--stepsize', default=1e-3, type=float,
+                        help='Gradient descent stepsize')
+    parser.add_argument('--max_it', default=10000, type=int,
+                        help='Maximum iteration times')
+    parser.add_argument('--regression_bound', default=1e-2, type=float,
+                        help='Bound of regression error')
+    parser.add_argument('--threads', default=1, type=int,
+                        help='Threads of each training job')
+    parser.add_argument('--jobs', default=0, type=int,
+                        help='Training jobs at the same time, all cores divided by threads by default')
+    parser.add_argument('--timeout', default=0, type=float,
+                        help='Seconds before a training job is stopped, 0 for none')
+    parser.add_argument('--output', default='results/sweep/sweep.csv', type=str,
+                        help='CSV file of the results table')
+    args = parser.parse_args()
+
+    networks = args.filename.split(',')
+    jobs = list(itertools.product(networks,
+                                  [float(L) for L in args.Lipschitz.split(',')],
+                                  [int(h) for h in args.hidden_dim.split(',')],
+                                  [int(n) for n in args.layers.split(',')]))
+    workers = args.jobs or max(1, multiprocessing.cpu_count() // args.threads)
+    if not os.path.isdir(os.path.join(dir, 'results', 'sweep')):
+        os.makedirs(os.path.join(dir, 'results', 'sweep'))
+
+    print('{} configurations on {} workers'.format(len(jobs), workers))
+    rows = []
+    with ThreadPoolExecutor(workers) as pool:
+        for row in pool.map(lambda job: run_job(job, args, args.threads), jobs):
+            print('{network} L={Lipschitz_target} h={hidden_dim} l={layers}: {status}'.format(**row))
+            rows.append(row)
+
+    print(format_table(rows, COLUMNS))
+    with open(os.path.join(dir, args.output), 'w') as f:
+        writer = csv.DictWriter(f, COLUMNS, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(rows)
+
+    # the selected network takes the name used by run_distillation.sh
+    for network in networks:
+        best = select([row for row in rows if row['network'] == network], args.regression_bound)
+        if best is None:
+            print('{}: no configuration meets the regression bound {}'.format(network, args.regression_bound))
+            continue
+        shutil.copyfile(os.path.join(dir, 'nn_retrained', best['output_file']),
+                        os.path.join(dir, 'nn_retrained', network + '_retrained'))
+        print('{}: Lipschitz {} with target {}, hidden_dim {}, layers {}, saved as {}_retrained'.format(
+            network, best['Lipschitz'], best['Lipschitz_target'], best['hidden_dim'], best['layers'], network))
@@ -13,7 +13,8 @@ class univAprox(object):
         layers=2,
         activation='RELU',
         scalar=1,
-        offset=0
+        offset=0,
+        power_iterations=1
     ):
         self.input_dim = input_dim
         self.output_dim = output_dim
@@ -21,6 +22,7 @@ class univAprox(object):
         self.layers = layers
         self.scalar = scalar
         self.offset = offset
+        self.power_iterations = power_iterations
 
         # activation type
         activations = activation.split('_')
@@ -32,6 +34,7 @@ class univAprox(object):
             self.last_layer_activation = None
 
         self.weights_original = None
+        self.spectral_norm_estimate = None
 
     def __call__(self, x):
         """
@@ -105,7 +108,38 @@ class univAprox(object):
         """
         this property should be used after variable initialization
         """
-        # Lipschitz
+        # exact spectral norm of the weights in each layer
+        return self.lipschitz_bound([tf.norm(weight, 2) for weight in self.weights])
+
+    @property
+    def lipschitz_estimate(self):
+        """
+        lipschitz_constant with the spectral norms estimated by power
+        iteration, each evaluation refines one persistent singular vector
+        per layer by power_iterations steps, the graph is built once
+        """
+        if self.spectral_norm_estimate is None:
+            norms = []
+            with tf.variable_scope('SpectralNorm'):
+                for i, weight in enumerate(self.weights):
+                    u = tf.get_variable('u{}'.format(i), [weight.shape[1].value, 1],
+                                        initializer=tf.random_normal_initializer(), trainable=False)
+                    u_hat = u
+                    for _ in range(self.power_iterations):
+                        v_hat = tf.nn.l2_normalize(tf.matmul(weight, u_hat), 0)
+                        u_hat = tf.nn.l2_normalize(tf.matmul(weight, v_hat, transpose_a=True), 0)
+                    # the gradient of v^T W u is v u^T, the one of the spectral norm
+                    u_hat = tf.stop_gradient(u_hat)
+                    v_hat = tf.stop_gradient(v_hat)
+                    with tf.control_dependencies([tf.assign(u, u_hat)]):
+                        norms.append(tf.reduce_sum(v_hat * tf.matmul(weight, u_hat)))
+            self.spectral_norm_estimate = self.lipschitz_bound(norms)
+        return self.spectral_norm_estimate
+
+    def lipschitz_bound(self, norms):
+        """
+        Lipschitz constant of the network from the norms of its weights
+        """
         if self.activation == 'RELU':
             scalar = 1
         elif self.activation == 'TANH':
@@ -115,8 +149,8 @@ class univAprox(object):
         # initialize L cosntant
         L = tf.constant(1.0)
         # multiply norm of weights in each layer
-        for i, weight in enumerate(self.weights):
-            L *= scalar * tf.norm(weight, 2)
+        for norm in norms:
+            L *= scalar * norm
 
         # activation function of output layer is not the same as other layers
         if self.last_layer_activation is not None: